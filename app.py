@@ -1,8 +1,7 @@
-from flask import Flask, jsonify, request, render_template, redirect, url_for, flash
+from flask import Flask, jsonify, request, render_template, redirect, url_for, flash, Response, stream_with_context
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from flask_bcrypt import Bcrypt
 import sqlite3
-import requests
 import json
 import logging
 from datetime import datetime, timedelta
@@ -10,7 +9,19 @@ import os
 import tempfile
 import re
 import html as ihtml
+import csv
+import io
+import hashlib
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from scraper_camara import obter_itens_pauta  # Importar o scraper
+import cliente_http
+import db
+from cache_compartilhado import criar_cache, TravaSQLite
+import cache_proposicoes
+import preaquecimento
 
 # --------------------------------------------------------------------------
 # CONFIGURAÇÕES DE LOGGING
@@ -32,78 +43,183 @@ login_manager = LoginManager(app)
 login_manager.login_view = 'usuarios.login'  # usa o blueprint externo
 
 # 🔹 Importa e registra o módulo de usuários (Blueprint)
-from usuarios import usuarios_bp, Usuario, buscar_usuario_por_id
+from usuarios import usuarios_bp, Usuario, buscar_usuario_por_id, usuarios_cache
 app.register_blueprint(usuarios_bp)
 
+# 🔹 Exportação da pauta em PDF (com cache em disco dos PDFs gerados)
+from exportar_pauta import exportar_bp, invalidar_pdfs, pdf_cache
+app.register_blueprint(exportar_bp)
+
 @login_manager.user_loader
 def load_user(user_id):
     return buscar_usuario_por_id(user_id)
 
-
-# Cache em memória
-pauta_cache = {}
-CACHE_DURATION = timedelta(minutes=5)
+@app.teardown_request
+def liberar_conexoes(exc):
+    # A conexão SQLite vive com a thread: nenhuma transação pode sobrar para a próxima requisição
+    db.liberar()
+
+
+# Cache de pautas (compartilhado entre os workers pelo SQLite; 'memoria' mantém um cache por processo)
+# Cada entrada guarda {'itens': [...], 'last_updated': '%Y-%m-%d %H:%M:%S'}
+PAUTA_CACHE_BACKEND = os.getenv("PAUTA_CACHE_BACKEND", "sqlite")
+pauta_cache = criar_cache("pauta", PAUTA_CACHE_BACKEND)
+CACHE_DURATION = timedelta(seconds=int(os.getenv("PAUTA_REFRESH_INTERVALO_SEGUNDOS", "300")))
+PAUTA_FALHA_TTL = 60             # segundos de espera antes de tentar raspar de novo após uma falha
+
+# Stale-while-revalidate: serve o último snapshot na hora e atualiza em segundo plano,
+# desde que ele não seja mais velho que PAUTA_MAX_STALENESS
+PAUTA_SWR = os.getenv("PAUTA_SWR", "true").lower() == "true"
+PAUTA_MAX_STALENESS = int(os.getenv("PAUTA_MAX_STALENESS_SEGUNDOS", "3600"))
+
+# Single-flight da montagem de pautas (trava por evento no SQLite, válida entre workers)
+trava_pautas = TravaSQLite()
+PAUTA_TRAVA_TTL = 150            # segundos; libera a trava se o worker dono morrer
+PAUTA_ESPERA_MAXIMA = 100        # segundos que uma requisição aguarda a montagem concorrente
+PAUTA_ESPERA_INTERVALO = 0.25
+PAUTA_RECARGA_MINIMA = float(os.getenv("PAUTA_RECARGA_MINIMA_SEGUNDOS", "30"))
+
+# Busca de destaques em lote: limite de downloads simultâneos e prazo máximo por pauta
+DESTAQUES_MAX_WORKERS = int(os.getenv("DESTAQUES_MAX_WORKERS", "8"))
+DESTAQUES_PRAZO = float(os.getenv("DESTAQUES_PRAZO_SEGUNDOS", "15"))
+_destaques_executor = ThreadPoolExecutor(max_workers=DESTAQUES_MAX_WORKERS, thread_name_prefix="destaques")
+
+# Atualização incremental: itens que não mudaram na página reaproveitam o enriquecimento
+# do snapshot anterior (detalhes/autores pelo TTL do scraper, destaques por DESTAQUES_TTL)
+PAUTA_INCREMENTAL = os.getenv("PAUTA_INCREMENTAL", "true").lower() == "true"
+DESTAQUES_TTL = int(os.getenv("DESTAQUES_TTL_SEGUNDOS", "600"))
+
+# Listagens de eventos por data no mesmo cache compartilhado: a de hoje muda ao longo do dia,
+# as futuras quando sessões são convocadas, e as passadas não mudam mais
+eventos_cache = criar_cache("eventos", PAUTA_CACHE_BACKEND)
+EVENTOS_TTL_HOJE = int(os.getenv("EVENTOS_TTL_HOJE_SEGUNDOS", "120"))
+EVENTOS_TTL_FUTURO = int(os.getenv("EVENTOS_TTL_FUTURO_SEGUNDOS", "900"))
+EVENTOS_TTL_PASSADO = int(os.getenv("EVENTOS_TTL_PASSADO_SEGUNDOS", str(30 * 24 * 3600)))
+EVENTOS_PREFETCH_DIAS = int(os.getenv("EVENTOS_PREFETCH_DIAS", "1"))
+_eventos_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="eventos")
+
+# Carregamento progressivo: sem snapshot utilizável, a página sai na hora e os itens chegam por stream
+PAUTA_PROGRESSIVA = os.getenv("PAUTA_PROGRESSIVA", "true").lower() == "true"
 
 # --------------------------------------------------------------------------
 # BANCO DE DADOS
 # --------------------------------------------------------------------------
 def init_db():
-    conn = sqlite3.connect('users.db')
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE NOT NULL,
-        password TEXT NOT NULL,
-        role TEXT NOT NULL
-    )''')
-    c.execute('''CREATE TABLE IF NOT EXISTS notas (
-        item_key TEXT PRIMARY KEY,
-        evento_id INTEGER,
-        ordem TEXT,
-        resumo_materia TEXT,
-        orientacao TEXT,
-        resumo_parecer TEXT
-    )''')
-    conn.commit()
-    users = [
-        ('admin', bcrypt.generate_password_hash('123').decode('utf-8'), 'Admin'),
-        ('assessor_plenario', bcrypt.generate_password_hash('123').decode('utf-8'), 'Assessor Plenário'),
-        ('assessor', bcrypt.generate_password_hash('123').decode('utf-8'), 'Assessor')
-    ]
-    for user in users:
-        try:
-            c.execute('INSERT INTO users (username, password, role) VALUES (?, ?, ?)', user)
-        except sqlite3.IntegrityError:
-            pass
-    conn.commit()
-    conn.close()
+    with db.conectar() as conn:
+        c = conn.cursor()
+        c.execute('''CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            role TEXT NOT NULL
+        )''')
+        c.execute('''CREATE TABLE IF NOT EXISTS notas (
+            item_key TEXT PRIMARY KEY,
+            evento_id INTEGER,
+            ordem TEXT,
+            resumo_materia TEXT,
+            orientacao TEXT,
+            resumo_parecer TEXT,
+            versao INTEGER NOT NULL DEFAULT 0
+        )''')
+        _migrar_notas(c)
+        conn.commit()
+        users = [
+            ('admin', bcrypt.generate_password_hash('123').decode('utf-8'), 'Admin'),
+            ('assessor_plenario', bcrypt.generate_password_hash('123').decode('utf-8'), 'Assessor Plenário'),
+            ('assessor', bcrypt.generate_password_hash('123').decode('utf-8'), 'Assessor')
+        ]
+        for user in users:
+            try:
+                c.execute('INSERT INTO users (username, password, role) VALUES (?, ?, ?)', user)
+            except sqlite3.IntegrityError:
+                pass
+        conn.commit()
 
-def init_pauta_cache_db():
-    conn = sqlite3.connect('users.db')
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS pauta_cache_db (
-                    evento_id INTEGER PRIMARY KEY,
-                    json_pauta TEXT,
-                    last_updated TEXT
-                )''')
-    conn.commit()
+def _migrar_notas(c):
     try:
-        c.execute("SELECT last_updated FROM pauta_cache_db WHERE 1=0")
+        c.execute("SELECT versao FROM notas WHERE 1=0")
     except sqlite3.OperationalError:
-        c.execute("ALTER TABLE pauta_cache_db ADD COLUMN last_updated TEXT")
-        logger.info("Coluna last_updated adicionada à tabela pauta_cache_db")
-    conn.commit()
-    conn.close()
+        c.execute("ALTER TABLE notas ADD COLUMN versao INTEGER NOT NULL DEFAULT 0")
+        logger.info("Coluna versao adicionada à tabela notas")
 
-def load_notas():
-    conn = sqlite3.connect('users.db')
+def init_pauta_cache_db():
+    with db.conectar() as conn:
+        c = conn.cursor()
+        c.execute('''CREATE TABLE IF NOT EXISTS pauta_cache_db (
+                        evento_id INTEGER PRIMARY KEY,
+                        json_pauta TEXT,
+                        last_updated TEXT,
+                        versao INTEGER NOT NULL DEFAULT 0,
+                        data_evento TEXT
+                    )''')
+        conn.commit()
+        try:
+            c.execute("SELECT last_updated FROM pauta_cache_db WHERE 1=0")
+        except sqlite3.OperationalError:
+            c.execute("ALTER TABLE pauta_cache_db ADD COLUMN last_updated TEXT")
+            logger.info("Coluna last_updated adicionada à tabela pauta_cache_db")
+        try:
+            c.execute("SELECT versao FROM pauta_cache_db WHERE 1=0")
+        except sqlite3.OperationalError:
+            c.execute("ALTER TABLE pauta_cache_db ADD COLUMN versao INTEGER NOT NULL DEFAULT 0")
+            logger.info("Coluna versao adicionada à tabela pauta_cache_db")
+        try:
+            c.execute("SELECT data_evento FROM pauta_cache_db WHERE 1=0")
+        except sqlite3.OperationalError:
+            c.execute("ALTER TABLE pauta_cache_db ADD COLUMN data_evento TEXT")
+            logger.info("Coluna data_evento adicionada à tabela pauta_cache_db")
+        # Exportações por período filtram os snapshots pela data do evento
+        c.execute("CREATE INDEX IF NOT EXISTS idx_pauta_cache_data_evento ON pauta_cache_db (data_evento)")
+        conn.commit()
+
+_esquema_versoes_ok = False
+
+def _garantir_esquema_versoes():
+    """Os workers do gunicorn não passam por init_db: cria as colunas de versão (e data_evento) na primeira vez que forem usadas"""
+    global _esquema_versoes_ok
+    if _esquema_versoes_ok:
+        return
+    init_pauta_cache_db()
+    conn = db.conectar()
+    try:
+        c = conn.cursor()
+        c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notas'")
+        if c.fetchone():
+            _migrar_notas(c)
+            conn.commit()
+    finally:
+        conn.close()
+    _esquema_versoes_ok = True
+
+# Máximo de proposições por consulta (3 parâmetros cada, abaixo do limite de 999 do SQLite)
+NOTAS_IDS_POR_CONSULTA = 300
+
+def load_notas(ids_proposicao):
+    """Carrega as notas PROP_/DSTQ_ das proposições informadas.
+
+    As chaves são buscadas pelo índice da chave primária (igualdade para PROP_<id> e
+    intervalo para DSTQ_<id>_*), sem varrer a tabela inteira.
+    """
+    ids = [str(i) for i in dict.fromkeys(ids_proposicao) if i]
+    if not ids:
+        return {}
+    _garantir_esquema_versoes()
+    conn = db.conectar()
     c = conn.cursor()
     try:
-        c.execute('SELECT item_key, resumo_materia, orientacao, resumo_parecer FROM notas')
-        notas = {
-            row[0]: {'resumo_materia': row[1] or '', 'orientacao': row[2] or '', 'resumo_parecer': row[3] or ''}
-            for row in c.fetchall()
-        }
+        notas = {}
+        for inicio in range(0, len(ids), NOTAS_IDS_POR_CONSULTA):
+            lote = ids[inicio:inicio + NOTAS_IDS_POR_CONSULTA]
+            filtros = " OR ".join(["item_key = ? OR (item_key >= ? AND item_key < ?)"] * len(lote))
+            # '`' é o caractere seguinte a '_': o intervalo cobre exatamente o prefixo DSTQ_<id>_
+            params = [p for id_prop in lote for p in (f"PROP_{id_prop}", f"DSTQ_{id_prop}_", f"DSTQ_{id_prop}`")]
+            c.execute(f'SELECT item_key, resumo_materia, orientacao, resumo_parecer, versao FROM notas WHERE {filtros}', params)
+            notas.update({
+                row[0]: {'resumo_materia': row[1] or '', 'orientacao': row[2] or '', 'resumo_parecer': row[3] or '',
+                         'versao': row[4] or 0}
+                for row in c.fetchall()
+            })
     except Exception as e:
         logger.warning(f"Erro ao carregar notas: {e}")
         init_db()
@@ -112,6 +228,32 @@ def load_notas():
         conn.close()
     return notas
 
+def aplicar_notas(itens, notas=None):
+    """Mescla as notas editoriais nos itens raspados da pauta (uma consulta indexada por pauta).
+
+    Os itens em cache guardam apenas os dados raspados; as notas são sempre lidas da
+    tabela `notas` na hora de exibir, então uma edição aparece imediatamente.
+    `notas` permite reaproveitar o resultado de um load_notas já feito.
+    """
+    if notas is None:
+        notas = load_notas(item.get('id_principal') for item in itens)
+    mesclados = []
+    for item in itens:
+        id_principal = item.get('id_principal')
+        nota = notas.get(f"PROP_{id_principal}", {})
+        destaques = [
+            {**d, 'resumo_nota': notas.get(f"DSTQ_{id_principal}_{d.get('numero')}", {}).get('resumo_materia', '')}
+            for d in item.get('destaques_emendas', [])
+        ]
+        mesclados.append({
+            **item,
+            'resumo_materia': nota.get('resumo_materia', ''),
+            'orientacao': nota.get('orientacao', ''),
+            'resumo_parecer': nota.get('resumo_parecer', ''),
+            'destaques_emendas': destaques
+        })
+    return mesclados
+
 # --------------------------------------------------------------------------
 # AUXILIARES
 # --------------------------------------------------------------------------
@@ -127,7 +269,7 @@ def obter_destaques(id_proposicao):
     url = f"https://www.camara.leg.br/pplen/destaques.html?codOrgao=180&codProposicao={id_proposicao}"
     destaques = []
     try:
-        r = requests.get(url, timeout=10)
+        r = cliente_http.get(url)
         r.raise_for_status()
         html = r.text
         rows = re.findall(r'<tr[^>]*>(.*?)</tr>', html, flags=re.S | re.I)
@@ -149,25 +291,73 @@ def obter_destaques(id_proposicao):
                 'autoria': autoria_raw,
                 'descricao': descricao_raw,
                 'tipo_destaque': tipo_raw,
-                'situacao': situacao_raw,
-                'resumo_nota': ''
+                'situacao': situacao_raw
             })
-        notas_local = load_notas()
-        for d in destaques:
-            d_key = f"DSTQ_{id_proposicao}_{d['numero']}"
-            if d_key in notas_local:
-                d['resumo_nota'] = notas_local[d_key].get('resumo_materia', '')
         return destaques
     except Exception as e:
         logger.warning(f"Falha ao obter destaques de {id_proposicao}: {e}")
         return []
 
+def obter_destaques_em_lote(ids_proposicao, prazo=None):
+    """Busca os destaques de várias proposições em paralelo, esperando no máximo `prazo` segundos.
+
+    Retorna (destaques por id, futuros ainda pendentes por id).
+    """
+    prazo = DESTAQUES_PRAZO if prazo is None else prazo
+    futuros = {id_prop: _destaques_executor.submit(obter_destaques, id_prop) for id_prop in ids_proposicao}
+    concluidos, _ = wait(futuros.values(), timeout=prazo)
+    destaques = {id_prop: f.result() for id_prop, f in futuros.items() if f in concluidos}
+    pendentes = {id_prop: f for id_prop, f in futuros.items() if f not in concluidos}
+    if pendentes:
+        logger.warning(f"⏳ Destaques de {len(pendentes)} proposições não responderam em {prazo:g}s; marcados como pendentes.")
+    return destaques, pendentes
+
+def _completar_destaques_pendentes(evento_id, pendentes):
+    """Aguarda em segundo plano os destaques pendentes e os grava na pauta já em cache"""
+    def completar():
+        wait(pendentes.values())
+        destaques = {id_prop: f.result() for id_prop, f in pendentes.items()}
+
+        def preencher(itens, versao):
+            for item in itens:
+                id_prop = item.get('id_principal')
+                if item.get('destaques_pendentes') and id_prop in destaques:
+                    item['destaques_emendas'] = destaques[id_prop]
+                    item['destaques_pendentes'] = False
+                    item['destaques_em'] = time.time()
+                    item['versao'] = versao
+            return itens
+
+        conn = db.conectar()
+        c = conn.cursor()
+        try:
+            c.execute("BEGIN IMMEDIATE")
+            c.execute("SELECT json_pauta, versao FROM pauta_cache_db WHERE evento_id = ?", (evento_id,))
+            row = c.fetchone()
+            if not row:
+                conn.rollback()
+                return
+            versao = (row[1] or 0) + 1
+            itens = preencher(json.loads(row[0]), versao)
+            c.execute("UPDATE pauta_cache_db SET json_pauta = ?, versao = ? WHERE evento_id = ?",
+                      (json.dumps(itens), versao, evento_id))
+            conn.commit()
+            pauta_cache.alterar(str(evento_id), lambda entrada: {**entrada, 'itens': preencher(entrada['itens'], versao)})
+            logger.info(f"🧩 Destaques pendentes do evento {evento_id} concluídos em segundo plano.")
+        except Exception as e:
+            conn.rollback()
+            logger.warning(f"Falha ao completar destaques pendentes do evento {evento_id}: {e}")
+        finally:
+            conn.close()
+
+    threading.Thread(target=completar, name=f"destaques-{evento_id}", daemon=True).start()
+
 def obter_autores_proposicao(id_proposicao):
     try:
-        r = requests.get(f"https://dadosabertos.camara.leg.br/api/v2/proposicoes/{id_proposicao}/autores", timeout=10)
-        r.raise_for_status()
-        dados = r.json().get('dados', [])
-        autores = [a.get('nome', 'Desconhecido') for a in dados[:3]]
+        dados = cache_proposicoes.obter_proposicao(id_proposicao)['autores']
+        if dados is None:
+            raise ValueError("autores indisponíveis")
+        autores = [nome or 'Desconhecido' for nome in dados[:3]]
         return {'autores': ", ".join(autores) + (" e outros" if len(dados) > 3 else ""), 'tem_mais_autores': len(dados) > 3}
     except Exception as e:
         logger.error(f"Erro ao obter autores da proposição {id_proposicao}: {e}")
@@ -175,23 +365,35 @@ def obter_autores_proposicao(id_proposicao):
 
 def obter_situacao_proposicao(id_proposicao):
     try:
-        url = f"https://dadosabertos.camara.leg.br/api/v2/proposicoes/{id_proposicao}"
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-        dados = r.json().get("dados", {})
-        return dados.get("statusProposicao", {}).get("descricaoSituacao", "N/D")
+        return cache_proposicoes.obter_proposicao(id_proposicao, autores=False)['situacao'] or "N/D"
     except Exception as e:
         logger.warning(f"Falha ao obter situação da proposição {id_proposicao}: {e}")
         return "N/D"
 
+def _ttl_eventos(data):
+    """TTL da listagem (ou do evento) de uma data 'YYYY-MM-DD...', conforme ela seja passada, hoje ou futura"""
+    try:
+        dia = datetime.strptime(data[:10], '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return EVENTOS_TTL_HOJE
+    hoje = datetime.now(preaquecimento.FUSO).date()
+    if dia < hoje:
+        return EVENTOS_TTL_PASSADO
+    return EVENTOS_TTL_HOJE if dia == hoje else EVENTOS_TTL_FUTURO
+
 def fetch_eventos_por_data(data):
+    eventos = eventos_cache.get(f"data:{data}")
+    if eventos is not None:
+        logger.info(f"🟢 Eventos de {data} carregados do cache ({len(eventos)}).")
+        return eventos
+
     url = f"https://dadosabertos.camara.leg.br/api/v2/eventos?idOrgao=180&dataInicio={data}&dataFim={data}"
     try:
-        response = requests.get(url, timeout=10)
+        response = cliente_http.get(url)
         response.raise_for_status()
         dados = response.json().get('dados', [])
         logger.info(f"Eventos encontrados para a data {data}: {len(dados)}")
-        return [
+        eventos = [
             {
                 'id': str(e.get('id')),
                 'descricao': e.get('descricao', 'Sem descrição'),
@@ -207,14 +409,58 @@ def fetch_eventos_por_data(data):
         logger.error(f"Erro ao acessar API de eventos: {e}")
         return []
 
+    # Só respostas válidas entram no cache (inclusive listagens vazias); cada evento também
+    # fica disponível por id para o cabeçalho da pauta
+    ttl = _ttl_eventos(data)
+    eventos_cache.set(f"data:{data}", eventos, ttl)
+    for evento in eventos:
+        eventos_cache.set(f"id:{evento['id']}", evento, ttl)
+    _registrar_datas_eventos(eventos)
+    return eventos
+
+def _data_evento(evento_id):
+    """Data (AAAA-MM-DD) do evento pelo cache de eventos; None se desconhecida"""
+    data = fetch_evento_por_id(evento_id).get('dataHoraInicio', '')
+    return data[:10] if re.match(r'\d{4}-\d{2}-\d{2}', data) else None
+
+def _registrar_datas_eventos(eventos):
+    """Preenche a data dos snapshots gravados antes da coluna data_evento existir"""
+    datas = [(e['dataHoraInicio'][:10], int(e['id'])) for e in eventos if re.match(r'\d{4}-\d{2}-\d{2}', e.get('dataHoraInicio', ''))]
+    if not datas:
+        return
+    try:
+        _garantir_esquema_versoes()
+        conn = db.conectar()
+        try:
+            conn.executemany("UPDATE pauta_cache_db SET data_evento = ? WHERE evento_id = ? AND data_evento IS NULL", datas)
+            conn.commit()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning(f"Falha ao registrar a data dos eventos em pauta_cache_db: {e}")
+
+def preaquecer_eventos_vizinhos(data):
+    """Busca em segundo plano as listagens dos dias vizinhos a `data` que ainda não estão em cache"""
+    try:
+        dia = datetime.strptime(data, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return
+    for distancia in range(1, EVENTOS_PREFETCH_DIAS + 1):
+        for vizinho in (dia - timedelta(days=distancia), dia + timedelta(days=distancia)):
+            _eventos_executor.submit(fetch_eventos_por_data, vizinho.strftime('%Y-%m-%d'))
+
 def fetch_evento_por_id(evento_id):
+    evento = eventos_cache.get(f"id:{evento_id}")
+    if evento is not None:
+        return evento
+
     url = f"https://dadosabertos.camara.leg.br/api/v2/eventos/{evento_id}"
     try:
-        response = requests.get(url, timeout=10)
+        response = cliente_http.get(url)
         response.raise_for_status()
         e = response.json().get('dados', {})
         logger.info(f"Dados do evento {evento_id} obtidos com sucesso")
-        return {
+        evento = {
             'id': str(e.get('id', evento_id)),
             'descricao': e.get('descricao', 'Sessão Deliberativa'),
             'dataHoraInicio': e.get('dataHoraInicio', 'N/D'),
@@ -223,6 +469,8 @@ def fetch_evento_por_id(evento_id):
                 else e.get('localCamara', 'N/D'),
             'situacao': e.get('situacao', 'N/D')
         }
+        eventos_cache.set(f"id:{evento_id}", evento, _ttl_eventos(evento['dataHoraInicio']))
+        return evento
     except Exception as e:
         logger.error(f"Erro ao obter dados do evento {evento_id}: {e}")
         return {
@@ -236,54 +484,211 @@ def fetch_evento_por_id(evento_id):
 # --------------------------------------------------------------------------
 # PAUTA (com cache persistente e proteção contra sobrescrita)
 # --------------------------------------------------------------------------
-def fetch_pauta(evento_id, force_reload=False):
-    now = datetime.now()
-    cache_key = str(evento_id)
-    notas = load_notas()
+def fetch_pauta(evento_id, force_reload=False, progresso=None):
+    """Retorna (itens com as notas mescladas, from_cache).
 
-    if not force_reload and cache_key in pauta_cache:
-        cached = pauta_cache[cache_key]
-        if now - cached['timestamp'] < CACHE_DURATION:
-            logger.info(f"🟢 Pauta {evento_id} carregada do cache em memória.")
-            return cached['itens'], False
+    `progresso(posicao, total, item)` recebe os itens do scraper à medida que ficam prontos,
+    se esta chamada precisar raspar a pauta (ver obter_itens_pauta).
+    """
+    itens, from_cache = _carregar_pauta(evento_id, force_reload, progresso)
+    return aplicar_notas(itens), from_cache
 
-    logger.info(f"🔍 Buscando pauta do evento {evento_id} via scraping...")
-    conn = sqlite3.connect('users.db')
-    c = conn.cursor()
+def _carregar_pauta(evento_id, force_reload=False, progresso=None):
+    """Retorna (itens raspados, sem notas, from_cache)"""
+    cache_key = str(evento_id)
 
     if not force_reload:
+        entrada = pauta_cache.get(cache_key)
+        if entrada is not None:
+            logger.info(f"🟢 Pauta {evento_id} carregada do cache ({pauta_cache.backend}).")
+            return entrada['itens'], _idade_snapshot(entrada['last_updated']) >= CACHE_DURATION.total_seconds()
+
+        snapshot = _ler_snapshot(evento_id)
+        if snapshot:
+            itens, last_updated = snapshot
+            idade = _idade_snapshot(last_updated)
+            if idade < CACHE_DURATION.total_seconds():
+                logger.info(f"📦 Snapshot recente da pauta {evento_id} ({idade:.0f}s).")
+                _guardar_no_cache(evento_id, itens, last_updated, CACHE_DURATION.total_seconds() - idade)
+                return itens, False
+            if not PAUTA_SWR:
+                logger.info(f"📦 Carregado do cache persistente para evento {evento_id}, última atualização: {last_updated}")
+                _guardar_no_cache(evento_id, itens, last_updated)
+                return itens, True
+            if idade < PAUTA_MAX_STALENESS:
+                logger.info(f"📦 Servindo snapshot de {idade:.0f}s da pauta {evento_id} e atualizando em segundo plano.")
+                _revalidar_em_segundo_plano(evento_id)
+                return itens, True
+            logger.info(f"⌛ Snapshot da pauta {evento_id} passou de {PAUTA_MAX_STALENESS}s; raspando agora.")
+    else:
+        # Vários cliques em "Atualizar Pauta" em sequência aproveitam a mesma raspagem
+        snapshot = _ler_snapshot(evento_id)
+        if snapshot and _idade_snapshot(snapshot[1]) < PAUTA_RECARGA_MINIMA:
+            logger.info(f"🟢 Pauta {evento_id} raspada há menos de {PAUTA_RECARGA_MINIMA:g}s; recarga ignorada.")
+            _guardar_no_cache(evento_id, *snapshot)
+            return snapshot[0], False
+
+    return _construir_pauta_unica(evento_id, progresso)
+
+def _pauta_pronta(evento_id, force_reload=False):
+    """Indica se _carregar_pauta responderá sem raspar (há snapshot utilizável)"""
+    snapshot = _ler_snapshot(evento_id)
+    if not snapshot:
+        return False
+    idade = _idade_snapshot(snapshot[1])
+    if force_reload:
+        return idade < PAUTA_RECARGA_MINIMA
+    return not PAUTA_SWR or idade < PAUTA_MAX_STALENESS
+
+def _guardar_no_cache(evento_id, itens, last_updated, ttl=None):
+    ttl = CACHE_DURATION.total_seconds() if ttl is None else ttl
+    pauta_cache.set(str(evento_id), {'itens': itens, 'last_updated': last_updated}, ttl)
+
+def _revalidar_em_segundo_plano(evento_id):
+    """Dispara a raspagem da pauta numa thread, a menos que outra montagem já esteja em andamento"""
+    nome_trava = f"pauta:{evento_id}"
+    dono = trava_pautas.adquirir(nome_trava, PAUTA_TRAVA_TTL)
+    if not dono:
+        return
+
+    def revalidar():
+        try:
+            _construir_pauta(evento_id)
+        except Exception as e:
+            logger.warning(f"Falha na atualização em segundo plano da pauta {evento_id}: {e}")
+        finally:
+            trava_pautas.liberar(nome_trava, dono)
+
+    threading.Thread(target=revalidar, name=f"revalidar-{evento_id}", daemon=True).start()
+
+def _ler_snapshot(evento_id):
+    """Lê a pauta persistida em pauta_cache_db; retorna (itens, last_updated) ou None"""
+    conn = db.conectar()
+    c = conn.cursor()
+    try:
         try:
             c.execute("SELECT json_pauta, last_updated FROM pauta_cache_db WHERE evento_id = ?", (evento_id,))
             cached = c.fetchone()
-            if cached:
-                try:
-                    itens = json.loads(cached[0])
-                    last_updated = cached[1]
-                    logger.info(f"📦 Carregado do cache persistente para evento {evento_id}, última atualização: {last_updated}")
-                    pauta_cache[cache_key] = {'timestamp': now, 'itens': itens}
-                    conn.close()
-                    return itens, True
-                except json.JSONDecodeError:
-                    logger.warning(f"Cache inválido para evento {evento_id}")
         except sqlite3.OperationalError:
             logger.warning(f"Coluna last_updated não encontrada para evento {evento_id}. Tentando sem last_updated...")
-            c.execute("SELECT json_pauta FROM pauta_cache_db WHERE evento_id = ?", (evento_id,))
+            c.execute("SELECT json_pauta, NULL FROM pauta_cache_db WHERE evento_id = ?", (evento_id,))
             cached = c.fetchone()
-            if cached:
-                try:
-                    itens = json.loads(cached[0])
-                    logger.info(f"📦 Carregado do cache persistente para evento {evento_id}, sem last_updated")
-                    pauta_cache[cache_key] = {'timestamp': now, 'itens': itens}
-                    conn.close()
-                    return itens, True
-                except json.JSONDecodeError:
-                    logger.warning(f"Cache inválido para evento {evento_id}")
+    except sqlite3.OperationalError as e:
+        logger.warning(f"Cache persistente indisponível para evento {evento_id}: {e}")
+        return None
+    finally:
+        conn.close()
+    if not cached:
+        return None
+    try:
+        return json.loads(cached[0]), cached[1]
+    except (TypeError, json.JSONDecodeError):
+        logger.warning(f"Cache inválido para evento {evento_id}")
+        return None
 
+def _idade_snapshot(last_updated):
+    """Idade em segundos de um snapshot ('%Y-%m-%d %H:%M:%S'); infinita se desconhecida"""
+    try:
+        return (datetime.now() - datetime.strptime(last_updated, '%Y-%m-%d %H:%M:%S')).total_seconds()
+    except (TypeError, ValueError):
+        return float('inf')
+
+def _construir_pauta_unica(evento_id, progresso=None):
+    """Single-flight: só uma raspagem por evento de cada vez, entre threads e entre workers.
+
+    Quem obtém a trava raspa a pauta; as requisições concorrentes aguardam a trava ser
+    liberada e usam o snapshot gravado por ela.
+    """
+    nome_trava = f"pauta:{evento_id}"
+    inicio = time.time()
+    while True:
+        dono = trava_pautas.adquirir(nome_trava, PAUTA_TRAVA_TTL)
+        if dono:
+            try:
+                return _construir_pauta(evento_id, progresso)
+            finally:
+                trava_pautas.liberar(nome_trava, dono)
+
+        logger.info(f"⏳ Pauta {evento_id} já está sendo montada por outra requisição; aguardando...")
+        while trava_pautas.ocupada(nome_trava) and time.time() - inicio < PAUTA_ESPERA_MAXIMA:
+            time.sleep(PAUTA_ESPERA_INTERVALO)
+
+        snapshot = _ler_snapshot(evento_id)
+        if snapshot:
+            itens, last_updated = snapshot
+            recente = _idade_snapshot(last_updated) <= time.time() - inicio + 1
+            _guardar_no_cache(evento_id, itens, last_updated, CACHE_DURATION.total_seconds() if recente else PAUTA_FALHA_TTL)
+            logger.info(f"🤝 Pauta {evento_id} reaproveitada da montagem concorrente (recente: {recente}).")
+            return itens, not recente
+        if time.time() - inicio >= PAUTA_ESPERA_MAXIMA:
+            logger.warning(f"❌ Tempo de espera esgotado para a pauta {evento_id}.")
+            return [], True
+        # A montagem concorrente falhou sem deixar snapshot: tenta montar aqui
+
+def _enriquecimento_anterior(evento_id):
+    """Itens do último snapshot no formato do scraper, indexados por id_principal"""
+    snapshot = _ler_snapshot(evento_id)
+    if not snapshot:
+        return {}
+    return {
+        it['id_principal']: {
+            'codigo': it.get('projeto'),
+            'ementa': it.get('ementa'),
+            'autores': it.get('autor'),
+            'situacao': it.get('situacao'),
+            'urlInteiroTeor': it.get('urlInteiroTeor', ''),
+            'tem_mais_autores': it.get('tem_mais_autores', False),
+            'assinatura': it.get('assinatura'),
+            'enriquecido_em': it.get('enriquecido_em'),
+            'destaques_emendas': it.get('destaques_emendas', []),
+            'destaques_pendentes': it.get('destaques_pendentes', False),
+            'destaques_em': it.get('destaques_em')
+        }
+        for it in snapshot[0] if it.get('id_principal')
+    }
+
+# Campos que mudam a cada raspagem sem alterar o que o usuário vê
+_CAMPOS_VOLATEIS = ('versao', 'enriquecido_em', 'destaques_em')
+
+def _versionar_itens(itens, itens_anteriores, versao):
+    """Marca cada item com `versao`: a anterior se o conteúdo não mudou, senão a nova versão da pauta"""
+    def conteudo(item):
+        return {k: v for k, v in item.items() if k not in _CAMPOS_VOLATEIS}
+
+    anteriores = {it.get('id_principal'): it for it in itens_anteriores}
+    for item in itens:
+        anterior = anteriores.get(item.get('id_principal'))
+        if anterior and conteudo(anterior) == conteudo(item):
+            item['versao'] = anterior.get('versao', 0)
+        else:
+            item['versao'] = versao
+
+def _construir_pauta(evento_id, progresso=None):
+    """Raspa e enriquece a pauta, gravando o snapshot em pauta_cache_db e no cache compartilhado"""
+    logger.info(f"🔍 Buscando pauta do evento {evento_id} via scraping...")
     try:
-        itens = obter_itens_pauta(evento_id)
+        anteriores = _enriquecimento_anterior(evento_id) if PAUTA_INCREMENTAL else {}
+        itens = obter_itens_pauta(evento_id, anteriores=anteriores, progresso=progresso)
         if not itens:
             raise ValueError("Scraper não retornou itens")
 
+        # Destaques: reaproveita os de itens sem mudança na página, se ainda válidos
+        agora = time.time()
+        destaques_anteriores = {}
+        for item in itens:
+            anterior = anteriores.get(item.get('id_principal'))
+            if (anterior and anterior['assinatura'] == item.get('assinatura')
+                    and not anterior['destaques_pendentes']
+                    and agora - (anterior['destaques_em'] or 0) < DESTAQUES_TTL):
+                destaques_anteriores[item['id_principal']] = anterior
+
+        ids_unicos = list(dict.fromkeys(item.get('id_principal') for item in itens if item.get('id_principal')))
+        ids_destaques = [id_prop for id_prop in ids_unicos if id_prop not in destaques_anteriores]
+        destaques_por_id, destaques_pendentes = obter_destaques_em_lote(ids_destaques)
+        if anteriores:
+            logger.info(f"♻️ Atualização incremental do evento {evento_id}: destaques de "
+                        f"{len(destaques_anteriores)} itens reaproveitados, {len(ids_destaques)} buscados.")
+
         itens_processados = []
         vistos = set()
         for ordem, item in enumerate(itens, start=1):
@@ -293,14 +698,13 @@ def fetch_pauta(evento_id, force_reload=False):
             vistos.add(id_principal)
 
             autores = item.get('autores', 'N/D')
-            destaques = obter_destaques(id_principal)
+            if id_principal in destaques_anteriores:
+                destaques = destaques_anteriores[id_principal]['destaques_emendas']
+                destaques_em = destaques_anteriores[id_principal]['destaques_em']
+            else:
+                destaques = destaques_por_id.get(id_principal, [])
+                destaques_em = None if id_principal in destaques_pendentes else agora
             item_key = f"PROP_{id_principal}"
-
-            # Carregar notas apenas para resumo_materia, orientacao e resumo_parecer
-            nota = notas.get(item_key, {})
-            resumo_materia = nota.get('resumo_materia', '')
-            orientacao = nota.get('orientacao', '')
-            resumo_parecer = nota.get('resumo_parecer', '')
             secao = item.get('secao', 'N/D')
 
             # Status é SEMPRE o valor da seção do scraper
@@ -316,37 +720,51 @@ def fetch_pauta(evento_id, force_reload=False):
                 'relator': item.get('relator', 'Não atribuído'),
                 'situacao': item.get('situacao', 'N/D'),
                 'secao': secao,
-                'resumo_materia': resumo_materia,
-                'orientacao': orientacao,
-                'resumo_parecer': resumo_parecer,
                 'destaques_emendas': destaques,
-                'status': status
+                'destaques_pendentes': id_principal in destaques_pendentes,
+                'status': status,
+                'url': item.get('url', ''),
+                'urlInteiroTeor': item.get('urlInteiroTeor', ''),
+                'tem_mais_autores': item.get('tem_mais_autores', False),
+                'assinatura': item.get('assinatura'),
+                'enriquecido_em': item.get('enriquecido_em'),
+                'destaques_em': destaques_em
             }
             itens_processados.append(item_data)
 
         current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        c.execute('''INSERT OR REPLACE INTO pauta_cache_db (evento_id, json_pauta, last_updated)
-                     VALUES (?, ?, ?)''', (evento_id, json.dumps(itens_processados), current_time))
-        conn.commit()
-
-        pauta_cache[cache_key] = {'timestamp': now, 'itens': itens_processados}
+        data_evento = _data_evento(evento_id)
+        _garantir_esquema_versoes()
+        conn = db.conectar()
+        try:
+            # A versão é atribuída dentro da transação, contra o snapshot que está de fato gravado
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT json_pauta, versao, data_evento FROM pauta_cache_db WHERE evento_id = ?", (evento_id,)).fetchone()
+            versao = (row[1] or 0) + 1 if row else 1
+            _versionar_itens(itens_processados, json.loads(row[0]) if row and row[0] else [], versao)
+            conn.execute('''INSERT OR REPLACE INTO pauta_cache_db (evento_id, json_pauta, last_updated, versao, data_evento)
+                            VALUES (?, ?, ?, ?, ?)''', (evento_id, json.dumps(itens_processados), current_time, versao,
+                                                   data_evento or (row[2] if row else None)))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        _guardar_no_cache(evento_id, itens_processados, current_time)
         logger.info(f"✅ Pauta {evento_id} carregada via scraping com {len(itens_processados)} itens.")
-        conn.close()
+        if destaques_pendentes:
+            _completar_destaques_pendentes(evento_id, destaques_pendentes)
         return itens_processados, False
 
     except Exception as e:
         logger.warning(f"⚠️ Falha ao buscar via scraping ({e}). Tentando cache persistente...")
-        c.execute("SELECT json_pauta FROM pauta_cache_db WHERE evento_id = ?", (evento_id,))
-        cached = c.fetchone()
-        conn.close()
-        if cached:
-            try:
-                itens = json.loads(cached[0])
-                logger.info(f"📦 Usando cache persistente para {evento_id}.")
-                pauta_cache[cache_key] = {'timestamp': now, 'itens': itens}
-                return itens, True
-            except json.JSONDecodeError:
-                logger.warning(f"Cache inválido para evento {evento_id}")
+        snapshot = _ler_snapshot(evento_id)
+        if snapshot:
+            logger.info(f"📦 Usando cache persistente para {evento_id}.")
+            _guardar_no_cache(evento_id, *snapshot, ttl=PAUTA_FALHA_TTL)
+            return snapshot[0], True
         logger.warning(f"❌ Nenhum dado de cache disponível para {evento_id}.")
         return [], True
 
@@ -370,9 +788,11 @@ def datetimeformat(value, format='%d/%m/%Y %H:%M'):
 @app.route('/selecionar-data', methods=['GET', 'POST'])
 @login_required
 def selecionar_data():
-    data = request.form.get('data', datetime.now().strftime('%Y-%m-%d'))
+    # "Hoje" no horário de Brasília, o mesmo dia que _ttl_eventos e o pré-aquecedor consideram hoje
+    data = request.form.get('data', datetime.now(preaquecimento.FUSO).strftime('%Y-%m-%d'))
     logger.info(f"Usuário {current_user.username} selecionou a data {data}")
     eventos = fetch_eventos_por_data(data)
+    preaquecer_eventos_vizinhos(data)
     return render_template('selecionar_data.html', data_selecionada=data, eventos=eventos, user_role=current_user.role)
 
 @app.route('/pauta/<int:evento_id>/view')
@@ -380,21 +800,24 @@ def selecionar_data():
 def view_pauta(evento_id):
     logger.info(f"Usuário {current_user.username} acessando pauta do evento {evento_id}")
     force_reload = request.args.get('force_reload', 'false').lower() == 'true'
-    itens, from_cache = fetch_pauta(evento_id, force_reload)
-    last_updated = None
 
-    conn = sqlite3.connect('users.db')
-    c = conn.cursor()
-    try:
-        c.execute("SELECT last_updated FROM pauta_cache_db WHERE evento_id = ?", (evento_id,))
-        row = c.fetchone()
-        if row:
-            last_updated = row[0]
-            logger.info(f"last_updated recuperado para evento {evento_id}: {last_updated}")
-    except sqlite3.OperationalError:
-        logger.warning(f"Coluna last_updated não encontrada para evento {evento_id}. Usando cache sem last_updated.")
-    finally:
-        conn.close()
+    # Pauta ainda por raspar: devolve já o cabeçalho do evento e carrega os itens via /stream
+    if PAUTA_PROGRESSIVA and not _pauta_pronta(evento_id, force_reload):
+        logger.info(f"🌊 Pauta {evento_id} sem snapshot utilizável; carregamento progressivo.")
+        return render_template(
+            'pauta.html',
+            evento_id=evento_id,
+            evento=fetch_evento_por_id(evento_id),
+            itens=[],
+            from_cache=False,
+            user_role=current_user.role,
+            last_updated=None,
+            progressivo=True,
+            stream_url=url_for('stream_pauta', evento_id=evento_id, force_reload='true' if force_reload else None)
+        )
+
+    itens, from_cache = fetch_pauta(evento_id, force_reload)
+    last_updated = _last_updated(evento_id)
 
     # Buscar informações do evento dinamicamente
     evento = fetch_evento_por_id(evento_id)
@@ -409,6 +832,74 @@ def view_pauta(evento_id):
         last_updated=last_updated
     )
 
+def _last_updated(evento_id):
+    conn = db.conectar()
+    c = conn.cursor()
+    try:
+        c.execute("SELECT last_updated FROM pauta_cache_db WHERE evento_id = ?", (evento_id,))
+        row = c.fetchone()
+        if row:
+            logger.info(f"last_updated recuperado para evento {evento_id}: {row[0]}")
+            return row[0]
+    except sqlite3.OperationalError:
+        logger.warning(f"Coluna last_updated não encontrada para evento {evento_id}. Usando cache sem last_updated.")
+    finally:
+        conn.close()
+    return None
+
+@app.route('/pauta/<int:evento_id>/stream')
+@login_required
+def stream_pauta(evento_id):
+    """Itens da pauta em NDJSON: um card provisório por item enriquecido e, no fim, a pauta completa"""
+    force_reload = request.args.get('force_reload', 'false').lower() == 'true'
+    user_role = current_user.role
+    fila = queue.Queue()
+
+    def progresso(posicao, total, item):
+        fila.put(('item', posicao, total, item))
+
+    def montar():
+        try:
+            fila.put(('fim',) + fetch_pauta(evento_id, force_reload, progresso=progresso))
+        except Exception as e:
+            logger.warning(f"⚠️ Falha no carregamento progressivo da pauta {evento_id}: {e}")
+            fila.put(('fim', [], True))
+
+    threading.Thread(target=montar, name=f"stream-{evento_id}", daemon=True).start()
+
+    def gerar():
+        while True:
+            mensagem = fila.get()
+            if mensagem[0] == 'item':
+                _, posicao, total, item = mensagem
+                provisorio = {
+                    'ordem': str(posicao + 1),
+                    'id_principal': item.get('id_principal'),
+                    'projeto': item.get('codigo'),
+                    'autor': item.get('autores', 'N/D'),
+                    'relator': item.get('relator', 'Não atribuído'),
+                    'situacao': item.get('situacao', 'N/D'),
+                    'status': item.get('secao', 'N/D'),
+                }
+                html = render_template('_pauta_item.html', item=provisorio, provisorio=True, user_role=user_role)
+                yield json.dumps({'tipo': 'item', 'posicao': posicao, 'total': total, 'html': html}) + "\n"
+            else:
+                _, itens, from_cache = mensagem
+                last_updated = _last_updated(evento_id)
+                yield json.dumps({
+                    'tipo': 'fim',
+                    'from_cache': from_cache,
+                    'last_updated': datetimeformat(last_updated, '%d/%m/%Y %H:%M') if last_updated else None,
+                    'html': render_template('_pauta_itens.html', itens=itens, user_role=user_role, evento_id=evento_id)
+                }) + "\n"
+                return
+
+    return Response(
+        stream_with_context(gerar()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/save_item', methods=['POST'])
 @login_required
 def save_item():
@@ -418,17 +909,24 @@ def save_item():
     ordem = data.get('ordem')
     logger.info(f"Usuário {current_user.username} salvando item para evento {evento_id}, ordem {ordem}")
 
-    conn = sqlite3.connect('users.db')
+    _garantir_esquema_versoes()
+    conn = db.conectar()
     c = conn.cursor()
     try:
+        # Versão monotônica das notas (usada nos ETags da API da pauta), atribuída sob a trava de escrita
+        c.execute("BEGIN IMMEDIATE")
+        c.execute("SELECT COALESCE(MAX(versao), 0) + 1 FROM notas")
+        versao = c.fetchone()[0]
+
         prop_key = f"PROP_{id_principal}"
         c.execute('''INSERT OR REPLACE INTO notas 
-                    (item_key, evento_id, ordem, resumo_materia, orientacao, resumo_parecer)
-                    VALUES (?, ?, ?, ?, ?, ?)''',
+                    (item_key, evento_id, ordem, resumo_materia, orientacao, resumo_parecer, versao)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)''',
                 (prop_key, evento_id, ordem,
                 data.get('resumo_materia', ''),
                 data.get('orientacao', ''),
-                data.get('resumo_parecer', '')))
+                data.get('resumo_parecer', ''),
+                versao))
 
         destaques = data.get('destaques', [])
         for d in destaques:
@@ -438,12 +936,12 @@ def save_item():
                 continue
             d_key = f"DSTQ_{id_principal}_{numero}"
             c.execute('''INSERT OR REPLACE INTO notas 
-                        (item_key, evento_id, ordem, resumo_materia, orientacao, resumo_parecer)
-                        VALUES (?, ?, ?, ?, ?, ?)''',
-                    (d_key, evento_id, ordem, resumo, '', ''))
+                        (item_key, evento_id, ordem, resumo_materia, orientacao, resumo_parecer, versao)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                    (d_key, evento_id, ordem, resumo, '', '', versao))
 
         conn.commit()
-        pauta_cache.clear()
+        invalidar_pdfs(evento_id)
         logger.info(f"Item salvo com sucesso para evento {evento_id}, ordem {ordem}")
         return jsonify({'message': 'Item e destaques salvos com sucesso!'})
     except Exception as e:
@@ -453,13 +951,226 @@ def save_item():
     finally:
         conn.close()
 
+# Campos internos do snapshot que não saem na API
+_CAMPOS_INTERNOS_API = ('assinatura', 'enriquecido_em', 'destaques_em')
+
+def _versoes_notas_por_item(notas):
+    """Maior versão de nota (PROP_<id> e DSTQ_<id>_*) de cada proposição"""
+    versoes = {}
+    for chave, nota in notas.items():
+        id_prop = chave.split('_')[1]
+        versoes[id_prop] = max(versoes.get(id_prop, 0), nota.get('versao', 0))
+    return versoes
+
+def estado_pauta(evento_id):
+    """Itens raspados da pauta, suas notas e a versão corrente.
+
+    Retorna um dicionário com `itens` (sem notas), `from_cache`, `notas`, `versoes_notas`
+    (por id_principal), `ids`, `versao` ("<versão dos itens>.<versão das notas>") e
+    `assinatura`, que muda sempre que a pauta exibida mudaria.
+    """
+    itens, from_cache = _carregar_pauta(evento_id)
+    notas = load_notas(item.get('id_principal') for item in itens)
+    versoes_notas = _versoes_notas_por_item(notas)
+
+    ids = [item.get('id_principal') for item in itens]
+    versao_itens = max((item.get('versao', 0) for item in itens), default=0)
+    versao_notas = max(versoes_notas.values(), default=0)
+    versao = f"{versao_itens}.{versao_notas}"
+    # A lista de ids entra na assinatura: remover um item muda a pauta sem criar versão de item nova
+    assinatura = f"{versao}-{hashlib.sha1(json.dumps(ids).encode('utf-8')).hexdigest()[:12]}"
+    return {'itens': itens, 'from_cache': from_cache, 'notas': notas, 'versoes_notas': versoes_notas,
+            'ids': ids, 'versao': versao, 'assinatura': assinatura}
+
+@app.route('/api/pauta/<int:evento_id>')
+@login_required
+def api_pauta(evento_id):
+    """Pauta e dados do evento em JSON, com ETag forte e GET condicional.
+
+    A versão tem o formato "<versão dos itens>.<versão das notas>". Com `since=<versão>`,
+    só os itens alterados desde então são devolvidos; `ids` traz sempre a ordem completa,
+    para o cliente descartar os itens removidos.
+    """
+    estado = estado_pauta(evento_id)
+    itens, notas, versoes_notas = estado['itens'], estado['notas'], estado['versoes_notas']
+    versao = estado['versao']
+    evento = fetch_evento_por_id(evento_id)
+    last_updated = _last_updated(evento_id)
+    # ETag forte: tudo o que vai no corpo entra no validador, inclusive a situação e os horários da sessão
+    cabecalho = hashlib.sha1(json.dumps([evento, last_updated], sort_keys=True, default=str).encode('utf-8')).hexdigest()[:12]
+    etag = f"{evento_id}-{estado['assinatura']}-{cabecalho}"
+
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+        resp.set_etag(etag)
+        return resp
+
+    since = request.args.get('since')
+    if since:
+        match = re.fullmatch(r'(\d+)\.(\d+)', since)
+        if not match:
+            return jsonify({"erro": "Parâmetro since inválido. Use a versão devolvida pela API (ex.: '12.3')."}), 400
+        desde_itens, desde_notas = int(match.group(1)), int(match.group(2))
+        itens = [
+            item for item in itens
+            if item.get('versao', 0) > desde_itens or versoes_notas.get(str(item.get('id_principal')), 0) > desde_notas
+        ]
+
+    resp = jsonify({
+        'evento_id': evento_id,
+        'evento': evento,
+        'versao': versao,
+        'since': since,
+        'last_updated': last_updated,
+        'ids': estado['ids'],
+        'itens': [
+            {k: v for k, v in item.items() if k not in _CAMPOS_INTERNOS_API}
+            for item in aplicar_notas(itens, notas)
+        ]
+    })
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp
+
+# Colunas das exportações de dados: um registro por item da pauta e um por destaque
+COLUNAS_EXPORTACAO = [
+    'tipo', 'evento_id', 'data_evento', 'ordem', 'id_principal', 'projeto', 'ementa', 'autor', 'relator',
+    'situacao', 'secao', 'url', 'destaque_numero', 'destaque_autoria', 'destaque_descricao', 'destaque_tipo',
+    'destaque_situacao', 'resumo_materia', 'orientacao', 'resumo_parecer',
+]
+# Tamanho aproximado de cada pedaço do CSV enviado ao cliente
+EXPORTACAO_CSV_BLOCO = 16 * 1024
+
+def _eventos_exportacao(evento_id=None, inicio=None, fim=None):
+    """(evento_id, data_evento) dos snapshots de um evento ou de um período, em ordem cronológica"""
+    _garantir_esquema_versoes()
+    conn = db.conectar()
+    try:
+        if evento_id is not None:
+            return conn.execute("SELECT evento_id, data_evento FROM pauta_cache_db WHERE evento_id = ?",
+                                (evento_id,)).fetchall()
+        return conn.execute('''SELECT evento_id, data_evento FROM pauta_cache_db
+                               WHERE data_evento BETWEEN ? AND ? ORDER BY data_evento, evento_id''',
+                            (inicio, fim)).fetchall()
+    finally:
+        conn.close()
+
+def linhas_exportacao(eventos):
+    """Gera os registros de itens, destaques e notas evento a evento.
+
+    Só o snapshot (e as notas) de um evento fica em memória por vez, então a exportação
+    de meses inteiros usa a mesma memória que a de uma única pauta.
+    """
+    for evento_id, data_evento in eventos:
+        snapshot = _ler_snapshot(evento_id)
+        if not snapshot:
+            continue
+        for item in aplicar_notas(snapshot[0]):
+            registro = {
+                'evento_id': evento_id,
+                'data_evento': data_evento,
+                'ordem': item.get('ordem'),
+                'id_principal': item.get('id_principal'),
+                'projeto': item.get('projeto'),
+                'ementa': item.get('ementa'),
+                'autor': item.get('autor'),
+                'relator': item.get('relator'),
+                'situacao': item.get('situacao'),
+                'secao': item.get('secao'),
+                'url': item.get('url'),
+            }
+            yield {
+                'tipo': 'item', **registro,
+                'resumo_materia': _clean_html(item.get('resumo_materia')),
+                'orientacao': item.get('orientacao', ''),
+                'resumo_parecer': _clean_html(item.get('resumo_parecer')),
+            }
+            for d in item.get('destaques_emendas', []):
+                yield {
+                    'tipo': 'destaque', **registro,
+                    'destaque_numero': d.get('numero'),
+                    'destaque_autoria': d.get('autoria'),
+                    'destaque_descricao': d.get('descricao'),
+                    'destaque_tipo': d.get('tipo_destaque'),
+                    'destaque_situacao': d.get('situacao'),
+                    'resumo_materia': _clean_html(d.get('resumo_nota')),
+                }
+
+def _csv_em_fluxo(linhas):
+    """CSV com ';' e BOM (abre direto no Excel em português), enviado em blocos"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=COLUNAS_EXPORTACAO, delimiter=';', extrasaction='ignore')
+    buffer.write('\ufeff')
+    writer.writeheader()
+    for linha in linhas:
+        writer.writerow(linha)
+        if buffer.tell() >= EXPORTACAO_CSV_BLOCO:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+@app.route('/api/pauta/exportar')
+@login_required
+def exportar_dados_pauta():
+    """Itens, destaques e notas em NDJSON ou CSV, gerados em fluxo a partir dos snapshots gravados.
+
+    Parâmetros: `formato` (ndjson ou csv) e `evento_id` ou o período `inicio`/`fim` (AAAA-MM-DD).
+    """
+    formato = request.args.get('formato', 'ndjson').lower()
+    if formato not in ('ndjson', 'csv'):
+        return jsonify({"erro": "Formato inválido. Use ndjson ou csv."}), 400
+
+    evento_id = request.args.get('evento_id', type=int)
+    if evento_id is not None:
+        eventos = _eventos_exportacao(evento_id=evento_id)
+        if not eventos:
+            return jsonify({"erro": f"Pauta do evento {evento_id} ainda não foi carregada."}), 404
+        nome = f"pauta_{evento_id}"
+    else:
+        inicio, fim = request.args.get('inicio', ''), request.args.get('fim', '')
+        try:
+            if datetime.strptime(fim, '%Y-%m-%d') < datetime.strptime(inicio, '%Y-%m-%d'):
+                raise ValueError
+        except ValueError:
+            return jsonify({"erro": "Informe evento_id ou o período inicio/fim (AAAA-MM-DD, inicio <= fim)."}), 400
+        eventos = _eventos_exportacao(inicio=inicio, fim=fim)
+        nome = f"pautas_{inicio}_{fim}"
+
+    logger.info(f"Usuário {current_user.username} exportando {nome}.{formato} ({len(eventos)} eventos)")
+    linhas = linhas_exportacao(eventos)
+    if formato == 'csv':
+        corpo, mimetype = _csv_em_fluxo(linhas), 'text/csv'
+    else:
+        corpo, mimetype = (json.dumps(linha, ensure_ascii=False) + '\n' for linha in linhas), 'application/x-ndjson'
+    resp = Response(stream_with_context(corpo), mimetype=mimetype)
+    resp.headers['Content-Disposition'] = f'attachment; filename="{nome}.{formato}"'
+    resp.headers['X-Accel-Buffering'] = 'no'
+    return resp
+
+@app.route('/api/metricas')
+@login_required
+def api_metricas():
+    if current_user.role != 'Admin':
+        return jsonify({"erro": "Acesso restrito a administradores."}), 403
+    return jsonify({
+        'http': cliente_http.metricas(),
+        'cache_pauta': pauta_cache.metricas(),
+        'preaquecimento': preaquecimento.estado(),
+        'cache_proposicoes': cache_proposicoes.metricas(),
+        'cache_eventos': eventos_cache.metricas(),
+        'cache_usuarios': usuarios_cache.metricas(),
+        'cache_pdf': pdf_cache.metricas(),
+        'sqlite': db.metricas()
+    })
+
 
 # --------------------------------------------------------------------------
 # 🔹 ROTA ROBUSTA PARA GERAR ANÁLISE DE PL COM PDF E FALLBACK AUTOMÁTICO
 # --------------------------------------------------------------------------
 from openai import OpenAI
 from bs4 import BeautifulSoup
-import requests, re, io
+import re, io
 from pdfminer.high_level import extract_text
 
 # --------------------------------------------------------------
@@ -494,28 +1205,21 @@ def api_analisar_pl():
         tipo, numero, ano = match.groups()
         logger.info(f"🔎 Buscando projeto: tipo={tipo}, número={numero}, ano={ano}")
 
-        # 1️⃣ Busca na API
-        api_url = f"https://dadosabertos.camara.leg.br/api/v2/proposicoes?siglaTipo={tipo}&numero={numero}&ano={ano}"
-        r_api = requests.get(api_url, headers=headers, timeout=15)
-        r_api.raise_for_status()
-        dados_api = r_api.json()
-
-        if not dados_api.get("dados"):
+        # 1️⃣ Resolve o id pelo índice local (a API só é consultada para códigos desconhecidos)
+        id_prop = cache_proposicoes.buscar_id_por_codigo(tipo, numero, ano)
+        if not id_prop:
             return jsonify({"erro": f"{tipo} {numero}/{ano} não encontrado na API."}), 404
 
-        id_prop = dados_api["dados"][0]["id"]
         logger.info(f"📘 ID da proposição: {id_prop}")
 
-        # 2️⃣ Detalhes e link do PDF
-        url_detalhes = f"https://dadosabertos.camara.leg.br/api/v2/proposicoes/{id_prop}"
-        r_detalhes = requests.get(url_detalhes, headers=headers, timeout=15)
-        r_detalhes.raise_for_status()
-        dados_prop = r_detalhes.json().get("dados", {})
-        link_pdf = dados_prop.get("urlInteiroTeor")
+        # 2️⃣ Detalhes e link do PDF (cache de proposições)
+        link_pdf = cache_proposicoes.obter_proposicao(id_prop, autores=False)['url_inteiro_teor']
+        if not link_pdf:
+            raise ValueError(f"Inteiro teor indisponível para a proposição {id_prop}")
         logger.info(f"📄 PDF do inteiro teor: {link_pdf}")
 
         # 3️⃣ Faz download do PDF
-        pdf_bytes = requests.get(link_pdf, headers=headers, timeout=25).content
+        pdf_bytes = cliente_http.get(link_pdf, headers=headers, timeout=(3.05, 25)).content
         with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_pdf:
             temp_pdf.write(pdf_bytes)
             temp_pdf_path = temp_pdf.name
@@ -602,6 +1306,14 @@ def api_analisar_pl():
 
 
 
+# --------------------------------------------------------------------------
+# PRÉ-AQUECIMENTO DAS PAUTAS DO DIA (ligado por padrão; PAUTA_PREAQUECER=false desliga)
+# --------------------------------------------------------------------------
+# Cada worker inicia o seu, mas só o dono da trava "preaquecimento" trabalha; os demais ficam de reserva
+if os.getenv("PAUTA_PREAQUECER", "true").lower() == "true":
+    preaquecimento.iniciar_em_segundo_plano()
+
+
 # --------------------------------------------------------------------------
 if __name__ == '__main__':
     init_db()
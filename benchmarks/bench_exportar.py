@@ -0,0 +1,103 @@
+# benchmarks/bench_exportar.py
+"""Tempo e tamanho do PDF da pauta: recursos do processo (estilos prontos, logos num form XObject) x montagem a cada exportação.
+
+Uso: python benchmarks/bench_exportar.py [--itens 50] [--repeticoes 10]
+
+O modo "por exportação" reproduz o comportamento anterior: estilos recriados a cada
+documento e os logos lidos do arquivo e desenhados página a página.
+"""
+import argparse
+import os
+import re
+import statistics
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import exportar_pauta  # noqa: E402
+from reportlab.lib.pagesizes import A4  # noqa: E402
+from reportlab.lib.units import cm  # noqa: E402
+from reportlab.pdfbase.pdfmetrics import stringWidth  # noqa: E402
+
+NOTA = (
+    "<p>A proposição altera a legislação vigente para dispor sobre o tema indicado na ementa. "
+    "O parecer do relator é pela aprovação, com substitutivo que ajusta a redação e os prazos "
+    "de vigência. Recomenda-se acompanhar a votação dos destaques apresentados em Plenário.</p>"
+) * 3
+
+def pauta_sintetica(n):
+    evento = {"descricao": "Sessão Deliberativa Extraordinária", "dataHoraInicio": "2025-10-21T13:55", "local": "Plenário"}
+    itens = [{
+        "ordem": str(i),
+        "projeto": f"PL {1000 + i}/2025",
+        "ementa": f"Dispõe sobre a matéria número {i} e altera a Lei nº 8.666, de 21 de junho de 1993.",
+        "autor": f"Dep. Autor {i} (PL/SP)",
+        "relator": f"Dep. Relator {i} (PL/RJ)",
+        "situacao": "Pronta para Pauta no Plenário",
+        "resumo_materia": NOTA,
+    } for i in range(1, n + 1)]
+    return evento, itens
+
+def _header_footer_por_exportacao(canvas, doc, logos, header_text):
+    """Cabeçalho e rodapé como eram antes: logos lidos do caminho e desenhados em cada página"""
+    w, h = A4
+    canvas.saveState()
+    canvas.setStrokeColorRGB(0, 0.4, 0.2)
+    canvas.line(1.5*cm, h-1.8*cm, w-1.5*cm, h-1.8*cm)
+    for nome, x in [("logo_camara.png", 1.5*cm), ("logo_pl.png", w-3.7*cm)]:
+        path = os.path.join(exportar_pauta.STATIC_DIR, nome)
+        if os.path.exists(path):
+            canvas.drawImage(path, x, h-2.5*cm, width=2.3*cm, preserveAspectRatio=True, mask='auto')
+    canvas.setFont("Helvetica-Bold", 10)
+    text_w = stringWidth(header_text, "Helvetica-Bold", 10)
+    canvas.drawString((w - text_w) / 2, h - 1.7*cm, header_text)
+    canvas.setStrokeColorRGB(0, 0.4, 0.2)
+    canvas.line(1.5*cm, 1.5*cm, w-1.5*cm, 1.5*cm)
+    canvas.setFont("Helvetica", 9)
+    canvas.drawString(1.6*cm, 1.1*cm, "Liderança do Partido Liberal — Câmara dos Deputados")
+    canvas.drawRightString(w-1.6*cm, 1.1*cm, str(doc.page))
+    canvas.restoreState()
+
+_header_footer_atual = exportar_pauta._header_footer
+
+def gerar(evento, itens, por_exportacao):
+    if por_exportacao:
+        exportar_pauta._recursos = None  # estilos recriados a cada documento
+        exportar_pauta._header_footer = _header_footer_por_exportacao
+    try:
+        return exportar_pauta._gerar_pdf(0, evento, itens)
+    finally:
+        exportar_pauta._header_footer = _header_footer_atual
+
+MODOS = (("por exportação", True), ("recursos", False))
+
+def medir(evento, itens, repeticoes):
+    """Alterna os modos a cada repetição, para que variações da máquina afetem os dois igualmente"""
+    for _, por_exportacao in MODOS:
+        gerar(evento, itens, por_exportacao)  # aquecimento (imports e fontes do ReportLab)
+    tempos = {nome: [] for nome, _ in MODOS}
+    pdfs = {}
+    for _ in range(repeticoes):
+        for nome, por_exportacao in MODOS:
+            inicio = time.perf_counter()
+            pdfs[nome] = gerar(evento, itens, por_exportacao)
+            tempos[nome].append((time.perf_counter() - inicio) * 1000)
+    return {
+        nome: (statistics.median(tempos[nome]), min(tempos[nome]), len(pdfs[nome]) / 1024,
+               len(re.findall(rb"/Type /Page\b", pdfs[nome])))
+        for nome, _ in MODOS
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--itens", type=int, default=50)
+    parser.add_argument("--repeticoes", type=int, default=10)
+    args = parser.parse_args()
+
+    evento, itens = pauta_sintetica(args.itens)
+    print(f"Pauta sintética com {args.itens} itens (todos com Nota Técnica), {args.repeticoes} repetições\n")
+    print(f"{'modo':<16} {'mediana ms':>11} {'mínimo ms':>10} {'tamanho KiB':>12} {'páginas':>8}")
+    for nome, (mediana, minimo, tamanho, paginas) in medir(evento, itens, args.repeticoes).items():
+        print(f"{nome:<16} {mediana:>11.1f} {minimo:>10.1f} {tamanho:>12.1f} {paginas:>8}")
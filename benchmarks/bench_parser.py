@@ -0,0 +1,60 @@
+# benchmarks/bench_parser.py
+"""Compara os backends de parse da página do evento (tempo e pico de memória).
+
+Uso: python benchmarks/bench_parser.py [arquivo.html] [--repeticoes N]
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import scraper_camara  # noqa: E402
+
+COMBINACOES = [
+    ("html.parser", False),
+    ("html.parser", True),
+    ("lxml", False),
+    ("lxml", True),
+]
+
+def medir(html, parser, parcial, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        itens = scraper_camara._extrair_itens_html(html, parser=parser, parcial=parcial)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+
+    tracemalloc.start()
+    scraper_camara._extrair_itens_html(html, parser=parser, parcial=parcial)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return itens, statistics.median(tempos), min(tempos), pico / 1024
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("arquivo", nargs="?", default=os.path.join(RAIZ, "last_pauta.html"))
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    logging.getLogger("scraper_camara").setLevel(logging.WARNING)
+    with open(args.arquivo, encoding="utf-8") as f:
+        html = f.read()
+    print(f"{args.arquivo}: {len(html)} caracteres, {args.repeticoes} repetições\n")
+    print(f"{'parser':<12} {'parcial':<8} {'mediana ms':>11} {'mínimo ms':>10} {'pico KiB':>10} {'itens':>6}  iguais")
+
+    referencia = None
+    for nome, parcial in COMBINACOES:
+        try:
+            itens, mediana, minimo, pico = medir(html, nome, parcial, args.repeticoes)
+        except Exception as e:
+            print(f"{nome:<12} {str(parcial):<8} indisponível ({e})")
+            continue
+        if referencia is None:
+            referencia = itens
+        print(f"{nome:<12} {str(parcial):<8} {mediana:>11.1f} {minimo:>10.1f} {pico:>10.0f} {len(itens):>6}  {itens == referencia}")
@@ -0,0 +1,163 @@
+# benchmarks/bench_pauta.py
+"""Benchmark de ponta a ponta da pauta contra respostas gravadas da Câmara (sem rede).
+
+Gravar as fixtures (com rede):
+    python benchmarks/bench_pauta.py --gravar --evento 79930
+Reproduzir (sem rede), com latência injetada por requisição:
+    python benchmarks/bench_pauta.py --latencia-ms 80
+    python benchmarks/bench_pauta.py --latencia-ms gravada
+
+Sem --fixtures, a reprodução usa a gravação local (benchmarks/fixtures/camara_http.jsonl,
+fora do git) ou, se ela não existir, o evento sintético versionado. A gravação guarda
+ao lado, em <fixtures>.esperado.json, os ids da pauta raspada; na reprodução, cada
+execução é conferida contra eles e o benchmark falha se a pauta mudar.
+
+O evento sintético (evento_79930.sintetico.jsonl) NÃO é uma gravação: a página da sessão
+é a de last_pauta.html e as respostas da API foram montadas a partir dela, sem latência
+registrada — com ele, `--latencia-ms gravada` equivale a 0. Serve para rodar o benchmark
+sem rede e conferir a montagem da pauta; para tempos realistas, grave um evento com --gravar.
+
+Cada execução usa um users.db novo num diretório temporário: a primeira chamada de cada
+função mede o caminho frio e as seguintes o caminho com caches aquecidos.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+FIXTURES_PADRAO = os.path.join(RAIZ, "benchmarks", "fixtures", "camara_http.jsonl")
+# Evento sintético versionado (página salva da sessão 79930 + respostas da API montadas a partir dela)
+FIXTURES_EXEMPLO = os.path.join(RAIZ, "benchmarks", "fixtures", "evento_79930.sintetico.jsonl")
+
+def evento_gravado(arquivo):
+    """Primeiro evento cuja página foi gravada no arquivo de fixtures"""
+    with open(arquivo, encoding="utf-8") as f:
+        for linha in f:
+            match = re.search(r'"url": "https://www\.camara\.leg\.br/evento-legislativo/(\d+)"', linha)
+            if match:
+                return int(match.group(1))
+    return None
+
+def arquivo_esperado(fixtures):
+    return os.path.splitext(fixtures)[0] + ".esperado.json"
+
+def ler_esperado(fixtures):
+    """Ids da pauta de cada evento, guardados na gravação ({evento_id: [ids]})"""
+    try:
+        with open(arquivo_esperado(fixtures), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def gravar_esperado(fixtures, evento_id, itens):
+    esperado = ler_esperado(fixtures)
+    esperado[str(evento_id)] = [item["id_principal"] for item in itens]
+    with open(arquivo_esperado(fixtures), "w", encoding="utf-8") as f:
+        json.dump(esperado, f, indent=2)
+        f.write("\n")
+
+def conferir(nome, itens, ids_esperados):
+    """Interrompe o benchmark se a pauta reproduzida não for a gravada"""
+    ids = [item["id_principal"] for item in itens]
+    if ids != ids_esperados:
+        sys.exit(f"ERRO: {nome} devolveu {len(ids)} itens {ids}; a gravação tem {len(ids_esperados)} {ids_esperados}")
+
+def medir(nome, funcao, repeticoes, verificar=None):
+    import cliente_http
+
+    tempos = []
+    requisicoes = []
+    for _ in range(repeticoes):
+        antes = cliente_http.metricas()["requisicoes"]
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        requisicoes.append(cliente_http.metricas()["requisicoes"] - antes)
+        if verificar:
+            verificar(resultado)
+    quente = statistics.median(tempos[1:]) if len(tempos) > 1 else float("nan")
+    print(f"{nome:<22} {tempos[0]:>10.1f} {quente:>12.1f} {requisicoes[0]:>10} {max(requisicoes[1:], default=0):>12}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", help="arquivo JSONL de respostas gravadas (padrão: gravação local ou o evento sintético)")
+    parser.add_argument("--gravar", action="store_true", help="usa a rede e acrescenta as respostas ao arquivo")
+    parser.add_argument("--evento", type=int, help="id do evento (padrão: o primeiro gravado)")
+    parser.add_argument("--proposicao", help="id da proposição para obter_destaques (padrão: o primeiro item da pauta)")
+    parser.add_argument("--latencia-ms", default="0", help="latência injetada na reprodução: ms ou 'gravada'")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.fixtures:
+        fixtures = os.path.abspath(args.fixtures)
+    elif args.gravar or os.path.exists(FIXTURES_PADRAO):
+        fixtures = FIXTURES_PADRAO
+    else:
+        fixtures = FIXTURES_EXEMPLO
+    evento_id = args.evento or (None if args.gravar or not os.path.exists(fixtures) else evento_gravado(fixtures))
+    if not evento_id:
+        parser.error("informe --evento (ou grave as fixtures antes com --gravar --evento ID)")
+
+    # Banco novo a cada execução; a chave da OpenAI só é exigida na importação do app
+    os.chdir(tempfile.mkdtemp(prefix="bench_pauta_"))
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark-offline")
+    os.environ["PAUTA_PREAQUECER"] = "false"  # nenhuma raspagem fora das medidas
+    logging.disable(logging.WARNING)
+
+    import cliente_http
+    cliente_http.configurar_fixtures("gravar" if args.gravar else "reproduzir", fixtures, args.latencia_ms)
+
+    import app as aplicacao
+    import exportar_pauta
+    aplicacao.init_db()
+    aplicacao.init_pauta_cache_db()
+    cliente_web = aplicacao.app.test_client()
+    cliente_web.post("/login", data={"username": "admin", "password": "123"})
+
+    import scraper_camara
+
+    itens = scraper_camara.obter_itens_pauta(evento_id)
+    id_proposicao = args.proposicao or (itens[0]["id_principal"] if itens else None)
+
+    verificar_itens = verificar_pauta = None
+    if args.gravar:
+        gravar_esperado(fixtures, evento_id, itens)
+    else:
+        ids_esperados = ler_esperado(fixtures).get(str(evento_id))
+        if ids_esperados is None:
+            parser.error(f"sem pauta esperada para o evento {evento_id} em {arquivo_esperado(fixtures)}; grave de novo com --gravar")
+        conferir("obter_itens_pauta", itens, ids_esperados)
+        verificar_itens = lambda itens: conferir("obter_itens_pauta", itens, ids_esperados)  # noqa: E731
+        verificar_pauta = lambda resultado: conferir("fetch_pauta", resultado[0], ids_esperados)  # noqa: E731
+
+    modo = "gravando" if args.gravar else f"reproduzindo {os.path.basename(fixtures)} (latência {args.latencia_ms} ms)"
+    if fixtures == FIXTURES_EXEMPLO and args.latencia_ms == "gravada":
+        modo += " — evento sintético, sem latência gravada: equivale a 0 ms"
+    print(f"Evento {evento_id}, {len(itens)} itens — {modo}, {args.repeticoes} repetições\n")
+    print(f"{'função':<22} {'frio ms':>10} {'quente ms':>12} {'req. frio':>10} {'req. quente':>12}")
+
+    # A raspagem acima já aqueceu o cache de proposições; limpa-o para medir obter_itens_pauta a frio
+    with sqlite3.connect("users.db") as conn:
+        conn.execute("DELETE FROM proposicoes_cache")
+
+    medir("obter_itens_pauta", lambda: scraper_camara.obter_itens_pauta(evento_id), args.repeticoes, verificar_itens)
+    medir("fetch_pauta", lambda: aplicacao.fetch_pauta(evento_id), args.repeticoes, verificar_pauta)
+    if id_proposicao:
+        medir("obter_destaques", lambda: aplicacao.obter_destaques(id_proposicao), args.repeticoes)
+    # O PDF gerado fica em cache: mede o caminho frio (sem arquivo) e o reaproveitamento
+    exportar_pauta.pdf_cache.invalidar(evento_id)
+    medir("exportar_pauta", lambda: cliente_web.get(f"/exportar/{evento_id}"), args.repeticoes)
+
+    http = cliente_http.metricas()
+    print(f"\nHTTP: {http['requisicoes']} requisições, {http['fixtures']}")
+    if not args.gravar:
+        print(f"Pauta conferida com a gravação: {len(itens)} itens, mesmos ids em todas as repetições.")
@@ -0,0 +1,292 @@
+# cache_compartilhado.py
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+import db
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------------------------------------------------------
+# BACKENDS DE CACHE
+# -----------------------------------------------------------------------------
+# Todos os backends guardam valores serializáveis em JSON, com TTL em segundos,
+# e expõem a mesma interface: get / set / alterar / invalidate / clear / metricas.
+
+class _Contadores:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._valores = {"hits": 0, "misses": 0, "gravacoes": 0, "invalidacoes": 0}
+
+    def incrementar(self, nome, n=1):
+        with self._lock:
+            self._valores[nome] += n
+
+    def retrato(self):
+        with self._lock:
+            valores = dict(self._valores)
+        consultas = valores["hits"] + valores["misses"]
+        valores["taxa_acerto"] = round(valores["hits"] / consultas, 3) if consultas else 0.0
+        return valores
+
+
+class CacheMemoria:
+    """Cache local ao processo (cada worker do gunicorn tem o seu)"""
+    backend = "memoria"
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self._dados = {}
+        self._lock = threading.Lock()
+        self._contadores = _Contadores()
+
+    def get(self, chave):
+        with self._lock:
+            entrada = self._dados.get(chave)
+            if entrada and entrada[1] <= time.time():
+                del self._dados[chave]
+                entrada = None
+        self._contadores.incrementar("hits" if entrada else "misses")
+        return entrada[0] if entrada else None
+
+    def set(self, chave, valor, ttl):
+        with self._lock:
+            self._dados[chave] = (valor, time.time() + ttl)
+        self._contadores.incrementar("gravacoes")
+
+    def alterar(self, chave, funcao):
+        """Aplica `funcao` ao valor de uma entrada válida, atomicamente e mantendo a expiração"""
+        with self._lock:
+            entrada = self._dados.get(chave)
+            if not entrada or entrada[1] <= time.time():
+                return False
+            self._dados[chave] = (funcao(entrada[0]), entrada[1])
+        self._contadores.incrementar("gravacoes")
+        return True
+
+    def invalidate(self, chave):
+        with self._lock:
+            removida = self._dados.pop(chave, None) is not None
+        self._contadores.incrementar("invalidacoes", int(removida))
+
+    def clear(self):
+        with self._lock:
+            removidas = len(self._dados)
+            self._dados.clear()
+        self._contadores.incrementar("invalidacoes", removidas)
+
+    def metricas(self):
+        with self._lock:
+            entradas = len(self._dados)
+        return {"backend": self.backend, "entradas": entradas, **self._contadores.retrato()}
+
+
+class CacheSQLite:
+    """Cache compartilhado entre processos, gravado no mesmo arquivo SQLite da aplicação.
+
+    Como todos os workers leem e gravam a mesma tabela, uma invalidação feita por
+    um worker vale imediatamente para os demais.
+    """
+    backend = "sqlite"
+
+    def __init__(self, namespace, caminho='users.db'):
+        self.namespace = namespace
+        self.caminho = caminho
+        self._contadores = _Contadores()
+        self._tabela_criada = False
+
+    def _conectar(self):
+        conn = db.conectar(self.caminho)
+        if not self._tabela_criada:
+            conn.execute('''CREATE TABLE IF NOT EXISTS cache_compartilhado (
+                chave TEXT PRIMARY KEY,
+                valor TEXT NOT NULL,
+                expira_em REAL NOT NULL
+            )''')
+            conn.commit()
+            self._tabela_criada = True
+        return conn
+
+    def _chave(self, chave):
+        return f"{self.namespace}:{chave}"
+
+    def get(self, chave):
+        conn = self._conectar()
+        try:
+            row = conn.execute(
+                "SELECT valor FROM cache_compartilhado WHERE chave = ? AND expira_em > ?",
+                (self._chave(chave), time.time())
+            ).fetchone()
+        finally:
+            conn.close()
+        self._contadores.incrementar("hits" if row else "misses")
+        return json.loads(row[0]) if row else None
+
+    def set(self, chave, valor, ttl):
+        conn = self._conectar()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_compartilhado (chave, valor, expira_em) VALUES (?, ?, ?)",
+                (self._chave(chave), json.dumps(valor), time.time() + ttl)
+            )
+            # Aproveita a gravação para descartar entradas vencidas deste namespace
+            conn.execute(
+                "DELETE FROM cache_compartilhado WHERE chave >= ? AND chave < ? AND expira_em <= ?",
+                (f"{self.namespace}:", f"{self.namespace};", time.time())
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        self._contadores.incrementar("gravacoes")
+
+    def alterar(self, chave, funcao):
+        """Aplica `funcao` ao valor de uma entrada válida, atomicamente e mantendo a expiração"""
+        conn = self._conectar()
+        try:
+            # BEGIN IMMEDIATE reserva a escrita: outro worker não altera a entrada entre a leitura e o UPDATE
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT valor FROM cache_compartilhado WHERE chave = ? AND expira_em > ?",
+                (self._chave(chave), time.time())
+            ).fetchone()
+            if not row:
+                conn.rollback()
+                return False
+            conn.execute(
+                "UPDATE cache_compartilhado SET valor = ? WHERE chave = ?",
+                (json.dumps(funcao(json.loads(row[0]))), self._chave(chave))
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        self._contadores.incrementar("gravacoes")
+        return True
+
+    def invalidate(self, chave):
+        conn = self._conectar()
+        try:
+            cur = conn.execute("DELETE FROM cache_compartilhado WHERE chave = ?", (self._chave(chave),))
+            conn.commit()
+            removidas = cur.rowcount
+        finally:
+            conn.close()
+        self._contadores.incrementar("invalidacoes", removidas)
+
+    def clear(self):
+        conn = self._conectar()
+        try:
+            # ';' é o caractere seguinte a ':': o intervalo cobre só as chaves deste namespace
+            cur = conn.execute(
+                "DELETE FROM cache_compartilhado WHERE chave >= ? AND chave < ?",
+                (f"{self.namespace}:", f"{self.namespace};")
+            )
+            conn.commit()
+            removidas = cur.rowcount
+        finally:
+            conn.close()
+        self._contadores.incrementar("invalidacoes", removidas)
+
+    def metricas(self):
+        conn = self._conectar()
+        try:
+            entradas = conn.execute(
+                "SELECT COUNT(*) FROM cache_compartilhado WHERE chave >= ? AND chave < ? AND expira_em > ?",
+                (f"{self.namespace}:", f"{self.namespace};", time.time())
+            ).fetchone()[0]
+        finally:
+            conn.close()
+        return {"backend": self.backend, "entradas": entradas, **self._contadores.retrato()}
+
+
+BACKENDS = {
+    CacheMemoria.backend: CacheMemoria,
+    CacheSQLite.backend: CacheSQLite,
+}
+
+def criar_cache(namespace, backend="sqlite"):
+    """Instancia o backend de cache pelo nome ('sqlite' ou 'memoria')"""
+    if backend not in BACKENDS:
+        logger.warning(f"⚠️ Backend de cache desconhecido '{backend}'. Usando 'sqlite'.")
+        backend = "sqlite"
+    return BACKENDS[backend](namespace)
+
+# -----------------------------------------------------------------------------
+# TRAVAS ENTRE PROCESSOS
+# -----------------------------------------------------------------------------
+class TravaSQLite:
+    """Trava nomeada com prazo de validade, compartilhada por threads e workers via SQLite.
+
+    O prazo (ttl) evita que a trava fique presa se o processo dono morrer no meio do trabalho.
+    """
+
+    def __init__(self, caminho='users.db'):
+        self.caminho = caminho
+        self._tabela_criada = False
+
+    def _conectar(self):
+        conn = db.conectar(self.caminho)
+        if not self._tabela_criada:
+            conn.execute('''CREATE TABLE IF NOT EXISTS travas (
+                nome TEXT PRIMARY KEY,
+                dono TEXT NOT NULL,
+                expira_em REAL NOT NULL
+            )''')
+            conn.commit()
+            self._tabela_criada = True
+        return conn
+
+    def adquirir(self, nome, ttl):
+        """Tenta adquirir a trava sem bloquear; retorna o identificador do dono ou None"""
+        dono = f"{os.getpid()}:{threading.get_ident()}:{uuid.uuid4().hex}"
+        conn = self._conectar()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM travas WHERE nome = ? AND expira_em <= ?", (nome, time.time()))
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO travas (nome, dono, expira_em) VALUES (?, ?, ?)",
+                (nome, dono, time.time() + ttl)
+            )
+            conn.commit()
+            return dono if cur.rowcount > 0 else None
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def renovar(self, nome, dono, ttl):
+        """Estende o prazo de uma trava ainda pertencente a `dono`; retorna se conseguiu"""
+        conn = self._conectar()
+        try:
+            cur = conn.execute(
+                "UPDATE travas SET expira_em = ? WHERE nome = ? AND dono = ? AND expira_em > ?",
+                (time.time() + ttl, nome, dono, time.time())
+            )
+            conn.commit()
+            return cur.rowcount > 0
+        finally:
+            conn.close()
+
+    def liberar(self, nome, dono):
+        conn = self._conectar()
+        try:
+            conn.execute("DELETE FROM travas WHERE nome = ? AND dono = ?", (nome, dono))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def ocupada(self, nome):
+        conn = self._conectar()
+        try:
+            row = conn.execute(
+                "SELECT 1 FROM travas WHERE nome = ? AND expira_em > ?", (nome, time.time())
+            ).fetchone()
+        finally:
+            conn.close()
+        return row is not None
@@ -0,0 +1,129 @@
+# cache_pdf.py
+import logging
+import os
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------------------------------------------------------
+# CONFIGURAÇÕES
+# -----------------------------------------------------------------------------
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", "cache_pdf")
+PDF_CACHE_MAX_MB = float(os.getenv("PDF_CACHE_MAX_MB", "200"))
+
+# -----------------------------------------------------------------------------
+# CACHE EM DISCO (endereçado por conteúdo, com despejo LRU)
+# -----------------------------------------------------------------------------
+class CacheArquivos:
+    """Arquivos gerados guardados em disco pela chave do conteúdo que os produziu.
+
+    O nome do arquivo é `<prefixo>-<chave>.pdf`; como a chave muda sempre que o conteúdo
+    muda, uma entrada nunca fica desatualizada, só deixa de ser usada. O mtime marca o
+    último acesso: quando o diretório passa do limite, os arquivos menos usados saem
+    primeiro. Gravações são atômicas (arquivo temporário + os.replace), então os
+    workers do gunicorn podem compartilhar o diretório.
+    """
+
+    def __init__(self, diretorio=PDF_CACHE_DIR, limite_mb=PDF_CACHE_MAX_MB, extensao=".pdf"):
+        # Absoluto: send_file resolveria um caminho relativo a partir da raiz do app, não do cwd
+        self.diretorio = os.path.abspath(diretorio)
+        self.limite_bytes = int(limite_mb * 1024 * 1024)
+        self.extensao = extensao
+        self._lock = threading.Lock()
+        self._contadores = {"hits": 0, "misses": 0, "gravacoes": 0, "invalidacoes": 0, "despejos": 0}
+
+    def _contar(self, nome, n=1):
+        with self._lock:
+            self._contadores[nome] += n
+
+    def _caminho(self, prefixo, chave):
+        return os.path.join(self.diretorio, f"{prefixo}-{chave}{self.extensao}")
+
+    def get(self, prefixo, chave):
+        """Caminho do arquivo em cache (e renova seu último acesso), ou None"""
+        caminho = self._caminho(prefixo, chave)
+        try:
+            os.utime(caminho, None)
+        except OSError:
+            self._contar("misses")
+            return None
+        self._contar("hits")
+        return caminho
+
+    def set(self, prefixo, chave, conteudo):
+        """Grava o arquivo e despeja os menos usados se o limite for ultrapassado; retorna o caminho"""
+        os.makedirs(self.diretorio, exist_ok=True)
+        caminho = self._caminho(prefixo, chave)
+        fd, temporario = tempfile.mkstemp(dir=self.diretorio, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(conteudo)
+            os.replace(temporario, caminho)
+        except BaseException:
+            try:
+                os.remove(temporario)
+            except OSError:
+                pass
+            raise
+        self._contar("gravacoes")
+        self._despejar(manter=caminho)
+        return caminho
+
+    def invalidar(self, prefixo):
+        """Remove todas as versões guardadas sob o prefixo (ex.: o id do evento)"""
+        removidos = 0
+        for entrada in self._entradas():
+            if entrada.name.startswith(f"{prefixo}-"):
+                try:
+                    os.remove(entrada.path)
+                    removidos += 1
+                except OSError:
+                    pass
+        self._contar("invalidacoes", removidos)
+        return removidos
+
+    def _entradas(self):
+        try:
+            with os.scandir(self.diretorio) as it:
+                return [e for e in it if e.is_file() and e.name.endswith(self.extensao)]
+        except FileNotFoundError:
+            return []
+
+    def _despejar(self, manter=None):
+        arquivos = []
+        for entrada in self._entradas():
+            try:
+                info = entrada.stat()
+            except OSError:
+                continue
+            arquivos.append((info.st_mtime, info.st_size, entrada.path))
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        for _, tamanho, caminho in sorted(arquivos):
+            if total <= self.limite_bytes:
+                break
+            if caminho == manter:
+                continue
+            try:
+                os.remove(caminho)
+            except OSError:
+                continue
+            total -= tamanho
+            self._contar("despejos")
+            logger.info(f"🧹 PDF {os.path.basename(caminho)} despejado do cache ({self.diretorio}).")
+
+    def metricas(self):
+        entradas = self._entradas()
+        tamanho = 0
+        for entrada in entradas:
+            try:
+                tamanho += entrada.stat().st_size
+            except OSError:
+                pass
+        with self._lock:
+            valores = dict(self._contadores)
+        consultas = valores["hits"] + valores["misses"]
+        valores["taxa_acerto"] = round(valores["hits"] / consultas, 3) if consultas else 0.0
+        return {"diretorio": self.diretorio, "entradas": len(entradas),
+                "tamanho_mb": round(tamanho / 1024 / 1024, 2), "limite_mb": round(self.limite_bytes / 1024 / 1024, 2),
+                **valores}
@@ -0,0 +1,286 @@
+# cache_proposicoes.py
+import argparse
+import csv
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import cliente_http
+import db
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------------------------------------------------------
+# CONFIGURAÇÕES
+# -----------------------------------------------------------------------------
+API_PROPOSICOES = "https://dadosabertos.camara.leg.br/api/v2/proposicoes"
+ARQUIVO_PROPOSICOES_ANO = "https://dadosabertos.camara.leg.br/arquivos/proposicoes/{formato}/proposicoes-{ano}.{formato}"
+
+# Ementa, autores e URL do inteiro teor quase nunca mudam; a situação muda ao longo da tramitação
+ESTATICOS_TTL = int(os.getenv("PROPOSICAO_ESTATICOS_TTL_SEGUNDOS", str(7 * 24 * 3600)))
+SITUACAO_TTL = int(os.getenv("PROPOSICAO_SITUACAO_TTL_SEGUNDOS", "600"))
+
+DB_PATH = 'users.db'
+
+_tabela_criada = False
+_contadores_lock = threading.Lock()
+_contadores = {
+    "hits": 0, "consultas_detalhes": 0, "consultas_autores": 0, "falhas": 0,
+    "codigos_resolvidos_local": 0, "codigos_consultados_api": 0,
+}
+
+def _contar(nome):
+    with _contadores_lock:
+        _contadores[nome] += 1
+
+def metricas():
+    with _contadores_lock:
+        return dict(_contadores)
+
+# -----------------------------------------------------------------------------
+# BANCO DE DADOS
+# -----------------------------------------------------------------------------
+def _conectar():
+    global _tabela_criada
+    conn = db.conectar(DB_PATH)
+    if not _tabela_criada:
+        conn.execute('''CREATE TABLE IF NOT EXISTS proposicoes_cache (
+            id_proposicao TEXT PRIMARY KEY,
+            ementa TEXT,
+            url_inteiro_teor TEXT,
+            estaticos_em REAL,
+            autores TEXT,
+            autores_em REAL,
+            situacao TEXT,
+            situacao_em REAL
+        )''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS proposicoes_codigos (
+            sigla_tipo TEXT NOT NULL,
+            numero INTEGER NOT NULL,
+            ano INTEGER NOT NULL,
+            id_proposicao TEXT NOT NULL,
+            PRIMARY KEY (sigla_tipo, numero, ano)
+        )''')
+        conn.commit()
+        _tabela_criada = True
+    return conn
+
+def _ler(id_prop):
+    conn = _conectar()
+    try:
+        row = conn.execute(
+            '''SELECT ementa, url_inteiro_teor, estaticos_em, autores, autores_em, situacao, situacao_em
+               FROM proposicoes_cache WHERE id_proposicao = ?''', (id_prop,)
+        ).fetchone()
+    finally:
+        conn.close()
+    if not row:
+        return None
+    return {
+        "ementa": row[0],
+        "url_inteiro_teor": row[1],
+        "estaticos_em": row[2],
+        "autores": json.loads(row[3]) if row[3] is not None else None,
+        "autores_em": row[4],
+        "situacao": row[5],
+        "situacao_em": row[6],
+    }
+
+# Colunas que cada consulta à API renova juntas
+CAMPOS_DETALHES = ("ementa", "url_inteiro_teor", "estaticos_em", "situacao", "situacao_em")
+CAMPOS_AUTORES = ("autores", "autores_em")
+
+def _gravar(id_prop, registro, campos):
+    """Grava só as colunas em `campos`: um chamador com um registro mais antigo em mãos não
+    sobrescreve o que outra requisição acabou de renovar (ex.: autores x situação)"""
+    valores = [json.dumps(registro[c]) if c == "autores" and registro[c] is not None else registro[c] for c in campos]
+    conn = _conectar()
+    try:
+        conn.execute(
+            f'''INSERT INTO proposicoes_cache (id_proposicao, {", ".join(campos)})
+               VALUES (?{", ?" * len(campos)})
+               ON CONFLICT (id_proposicao) DO UPDATE SET {", ".join(f"{c} = excluded.{c}" for c in campos)}''',
+            (id_prop, *valores)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+# -----------------------------------------------------------------------------
+# CONSULTA
+# -----------------------------------------------------------------------------
+def _vencido(registro, campo, ttl):
+    return not registro or registro[campo] is None or time.time() - registro[campo] >= ttl
+
+def obter_proposicao(id_prop, autores=True):
+    """Metadados de uma proposição, consultando a API só para os campos vencidos.
+
+    Retorna um dicionário com `ementa`, `url_inteiro_teor`, `situacao` e `autores` (lista de
+    nomes; None se desconhecidos). Em caso de falha na API, devolve os últimos valores
+    conhecidos (ou None nos campos nunca obtidos).
+    """
+    id_prop = str(id_prop)
+    registro = _ler(id_prop) or {
+        "ementa": None, "url_inteiro_teor": None, "estaticos_em": None,
+        "autores": None, "autores_em": None, "situacao": None, "situacao_em": None,
+    }
+    renovados = []
+
+    # /proposicoes/{id} traz os campos estáticos e a situação na mesma resposta
+    detalhes_vencidos = _vencido(registro, "estaticos_em", ESTATICOS_TTL) or _vencido(registro, "situacao_em", SITUACAO_TTL)
+    if detalhes_vencidos:
+        _contar("consultas_detalhes")
+        try:
+            r = cliente_http.get(f"{API_PROPOSICOES}/{id_prop}")
+            r.raise_for_status()
+            dados = r.json().get("dados", {})
+            agora = time.time()
+            if dados.get("siglaTipo") and dados.get("numero") and dados.get("ano"):
+                registrar_codigos([(dados["siglaTipo"], dados["numero"], dados["ano"], id_prop)])
+            registro.update({
+                "ementa": dados.get("ementa", ""),
+                "url_inteiro_teor": dados.get("urlInteiroTeor", ""),
+                "estaticos_em": agora,
+                "situacao": (dados.get("statusProposicao") or {}).get("descricaoSituacao", ""),
+                "situacao_em": agora,
+            })
+            renovados += CAMPOS_DETALHES
+        except Exception as e:
+            _contar("falhas")
+            logger.warning(f"⚠️ Falha ao obter detalhes da proposição {id_prop}: {e}")
+
+    autores_vencidos = autores and _vencido(registro, "autores_em", ESTATICOS_TTL)
+    if autores_vencidos:
+        _contar("consultas_autores")
+        try:
+            r = cliente_http.get(f"{API_PROPOSICOES}/{id_prop}/autores")
+            r.raise_for_status()
+            registro["autores"] = [a.get("nome") for a in r.json().get("dados", [])]
+            registro["autores_em"] = time.time()
+            renovados += CAMPOS_AUTORES
+        except Exception as e:
+            _contar("falhas")
+            logger.warning(f"⚠️ Falha ao obter autores da proposição {id_prop}: {e}")
+
+    # Acerto só quando nada estava vencido; consultas que falharam já contam em "falhas"
+    if not detalhes_vencidos and not autores_vencidos:
+        _contar("hits")
+    if renovados:
+        try:
+            _gravar(id_prop, registro, renovados)
+        except sqlite3.Error as e:
+            logger.warning(f"Falha ao gravar cache da proposição {id_prop}: {e}")
+    return registro
+
+# -----------------------------------------------------------------------------
+# ÍNDICE CÓDIGO → idProposicao
+# -----------------------------------------------------------------------------
+def separar_codigo(codigo):
+    """'PL 2768/2025', 'PEC 9/2024', 'PDL12/2023' → ('PL', 2768, 2025); None se o formato for inválido"""
+    match = re.match(r'\s*([A-Za-z]{2,5})\s*\.?\s*(\d+)\s*/\s*(\d{4})', codigo or "")
+    if not match:
+        return None
+    sigla, numero, ano = match.groups()
+    return sigla.upper(), int(numero), int(ano)
+
+def registrar_codigos(registros):
+    """Grava no índice tuplas (siglaTipo, numero, ano, id_proposicao); retorna quantas foram recebidas"""
+    linhas = [(str(s).upper(), int(n), int(a), str(i)) for s, n, a, i in registros]
+    if not linhas:
+        return 0
+    conn = _conectar()
+    try:
+        conn.executemany(
+            "INSERT OR REPLACE INTO proposicoes_codigos (sigla_tipo, numero, ano, id_proposicao) VALUES (?, ?, ?, ?)",
+            linhas
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return len(linhas)
+
+def buscar_id_por_codigo(sigla_tipo, numero, ano):
+    """Resolve o idProposicao pelo índice local; só consulta a API se o código ainda não for conhecido.
+
+    Retorna o id (str) ou None se a proposição não existir. Erros de rede são propagados.
+    """
+    sigla_tipo, numero, ano = sigla_tipo.upper(), int(numero), int(ano)
+    conn = _conectar()
+    try:
+        row = conn.execute(
+            "SELECT id_proposicao FROM proposicoes_codigos WHERE sigla_tipo = ? AND numero = ? AND ano = ?",
+            (sigla_tipo, numero, ano)
+        ).fetchone()
+    finally:
+        conn.close()
+    if row:
+        _contar("codigos_resolvidos_local")
+        return row[0]
+
+    _contar("codigos_consultados_api")
+    r = cliente_http.get(f"{API_PROPOSICOES}?siglaTipo={sigla_tipo}&numero={numero}&ano={ano}")
+    r.raise_for_status()
+    dados = r.json().get("dados", [])
+    registrar_codigos(
+        (d["siglaTipo"], d["numero"], d["ano"], d["id"])
+        for d in dados if d.get("siglaTipo") and d.get("numero") and d.get("ano") and d.get("id")
+    )
+    return str(dados[0]["id"]) if dados else None
+
+# -----------------------------------------------------------------------------
+# IMPORTAÇÃO EM LOTE (arquivos anuais do Dados Abertos)
+# -----------------------------------------------------------------------------
+def _ler_arquivo_proposicoes(caminho):
+    """Lê um arquivo proposicoes-<ano>.json ou .csv (separador ';') do Dados Abertos"""
+    if caminho.lower().endswith(".csv"):
+        with open(caminho, encoding="utf-8-sig", newline="") as f:
+            for linha in csv.DictReader(f, delimiter=";"):
+                yield linha
+    else:
+        with open(caminho, encoding="utf-8") as f:
+            yield from json.load(f).get("dados", [])
+
+def _registros_validos(proposicoes):
+    for p in proposicoes:
+        try:
+            yield p["siglaTipo"], int(p["numero"]), int(p["ano"]), p["id"]
+        except (KeyError, TypeError, ValueError):
+            continue
+
+def importar_ano(ano):
+    """Baixa o arquivo anual de proposições e alimenta o índice; retorna o total importado"""
+    url = ARQUIVO_PROPOSICOES_ANO.format(formato="json", ano=ano)
+    logger.info(f"⬇️ Baixando {url} ...")
+    r = cliente_http.get(url, timeout=(3.05, 300))
+    r.raise_for_status()
+    return registrar_codigos(_registros_validos(r.json().get("dados", [])))
+
+def importar_arquivo(caminho):
+    return registrar_codigos(_registros_validos(_ler_arquivo_proposicoes(caminho)))
+
+# -----------------------------------------------------------------------------
+# EXECUÇÃO DIRETA
+# -----------------------------------------------------------------------------
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Pré-carrega o índice código → idProposicao.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    importar = sub.add_parser("importar", help="importa proposições dos arquivos anuais do Dados Abertos")
+    importar.add_argument("--ano", type=int, action="append", default=[], help="ano a baixar (pode repetir)")
+    importar.add_argument("--arquivo", action="append", default=[], help="arquivo .json/.csv já baixado (pode repetir)")
+    args = parser.parse_args()
+
+    total = 0
+    for ano in args.ano:
+        n = importar_ano(ano)
+        logger.info(f"📥 {n} proposições de {ano} importadas.")
+        total += n
+    for caminho in args.arquivo:
+        n = importar_arquivo(caminho)
+        logger.info(f"📥 {n} proposições importadas de {caminho}.")
+        total += n
+    logger.info(f"✅ Índice atualizado com {total} proposições.")
@@ -0,0 +1,279 @@
+# cliente_http.py
+import base64
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------------------------------------------------------
+# CONFIGURAÇÕES
+# -----------------------------------------------------------------------------
+# Tamanho do pool de conexões keep-alive de cada host da Câmara
+POOL_POR_HOST = {
+    "dadosabertos.camara.leg.br": 16,
+    "www.camara.leg.br": 8,
+}
+POOL_PADRAO = 4
+
+# Timeouts (conexão, leitura) por endpoint — o prefixo mais longo que casar com a URL vence
+TIMEOUTS = {
+    "https://dadosabertos.camara.leg.br/api/v2/eventos": (3.05, 10),
+    "https://dadosabertos.camara.leg.br/api/v2/proposicoes": (3.05, 8),
+    "https://www.camara.leg.br/evento-legislativo": (3.05, 10),
+    "https://www.camara.leg.br/pplen": (3.05, 10),
+    "https://www.camara.leg.br/proposicoesWeb": (3.05, 25),
+}
+TIMEOUT_PADRAO = (3.05, 15)
+
+# Retentativas com backoff exponencial para 429 e erros 5xx (respeita Retry-After)
+RETRY = Retry(
+    total=3,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset(["GET", "HEAD"]),
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+
+HEADERS_PADRAO = {
+    "Accept-Encoding": "gzip, deflate",
+    "User-Agent": "sisPL/1.0 (+https://www.camara.leg.br)",
+}
+
+# Gravação/reprodução das chamadas à Câmara (benchmarks e testes de regressão sem rede):
+# ''           → rede normalmente
+# 'gravar'     → rede, e cada resposta é acrescentada ao arquivo JSONL de fixtures
+# 'reproduzir' → nenhuma chamada de rede; as respostas vêm do arquivo de fixtures
+MODO_FIXTURES = os.getenv("CAMARA_HTTP_MODO", "")
+ARQUIVO_FIXTURES = os.getenv("CAMARA_HTTP_FIXTURES", os.path.join("fixtures", "camara_http.jsonl"))
+# Latência injetada na reprodução: milissegundos fixos ou 'gravada' (a medida durante a gravação)
+LATENCIA_REPRODUCAO = os.getenv("CAMARA_HTTP_LATENCIA_MS", "0")
+
+# -----------------------------------------------------------------------------
+# MÉTRICAS
+# -----------------------------------------------------------------------------
+_metricas_lock = threading.Lock()
+_metricas = {
+    "requisicoes": 0,
+    "erros": 0,
+    "conexoes_novas": 0,
+    "latencia_total_ms": 0.0,
+    "latencia_max_ms": 0.0,
+    "por_host": {},
+    "gravadas": 0,
+    "reproduzidas": 0,
+    "sem_gravacao": 0,
+}
+
+def _contar(nome):
+    with _metricas_lock:
+        _metricas[nome] += 1
+
+def _contar_conexao_nova():
+    with _metricas_lock:
+        _metricas["conexoes_novas"] += 1
+
+def _registrar(url, inicio, erro=False):
+    latencia_ms = (time.perf_counter() - inicio) * 1000
+    host = urlsplit(url).hostname or ""
+    with _metricas_lock:
+        _metricas["requisicoes"] += 1
+        _metricas["erros"] += int(erro)
+        _metricas["latencia_total_ms"] += latencia_ms
+        _metricas["latencia_max_ms"] = max(_metricas["latencia_max_ms"], latencia_ms)
+        por_host = _metricas["por_host"].setdefault(host, {"requisicoes": 0, "latencia_total_ms": 0.0})
+        por_host["requisicoes"] += 1
+        por_host["latencia_total_ms"] += latencia_ms
+
+def metricas():
+    """Retorna um retrato dos contadores do cliente (requisições, reuso de conexões e latência)"""
+    with _metricas_lock:
+        total = _metricas["requisicoes"]
+        novas = _metricas["conexoes_novas"]
+        return {
+            "requisicoes": total,
+            "erros": _metricas["erros"],
+            "conexoes_novas": novas,
+            "taxa_reuso": round(max(0.0, 1 - novas / total), 3) if total else 0.0,
+            "latencia_media_ms": round(_metricas["latencia_total_ms"] / total, 1) if total else 0.0,
+            "latencia_max_ms": round(_metricas["latencia_max_ms"], 1),
+            "fixtures": {
+                "modo": _fixtures["modo"] or "rede",
+                "gravadas": _metricas["gravadas"],
+                "reproduzidas": _metricas["reproduzidas"],
+                "sem_gravacao": _metricas["sem_gravacao"],
+            },
+            "por_host": {
+                host: {
+                    "requisicoes": m["requisicoes"],
+                    "latencia_media_ms": round(m["latencia_total_ms"] / m["requisicoes"], 1),
+                }
+                for host, m in _metricas["por_host"].items()
+            },
+        }
+
+# -----------------------------------------------------------------------------
+# POOL DE CONEXÕES
+# -----------------------------------------------------------------------------
+class _PoolHTTPContado(HTTPConnectionPool):
+    def _new_conn(self):
+        _contar_conexao_nova()
+        return super()._new_conn()
+
+class _PoolHTTPSContado(HTTPSConnectionPool):
+    def _new_conn(self):
+        _contar_conexao_nova()
+        return super()._new_conn()
+
+class _AdaptadorContado(HTTPAdapter):
+    """HTTPAdapter que contabiliza cada conexão nova aberta pelo pool"""
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _PoolHTTPContado, "https": _PoolHTTPSContado}
+
+def _criar_adaptador(tamanho):
+    return _AdaptadorContado(pool_connections=2, pool_maxsize=tamanho, max_retries=RETRY)
+
+# Os adaptadores (e seus pools) são compartilhados por todas as threads do processo
+_adaptador_padrao = _criar_adaptador(POOL_PADRAO)
+_adaptadores = {host: _criar_adaptador(tamanho) for host, tamanho in POOL_POR_HOST.items()}
+
+_local = threading.local()
+
+def _sessao():
+    """Uma Session por thread (cookies/headers isolados), todas usando os mesmos pools"""
+    sessao = getattr(_local, "sessao", None)
+    if sessao is None:
+        sessao = requests.Session()
+        sessao.headers.update(HEADERS_PADRAO)
+        sessao.mount("http://", _adaptador_padrao)
+        sessao.mount("https://", _adaptador_padrao)
+        for host, adaptador in _adaptadores.items():
+            sessao.mount(f"https://{host}/", adaptador)
+        _local.sessao = sessao
+    return sessao
+
+def timeout_para(url):
+    prefixos = [p for p in TIMEOUTS if url.startswith(p)]
+    return TIMEOUTS[max(prefixos, key=len)] if prefixos else TIMEOUT_PADRAO
+
+# -----------------------------------------------------------------------------
+# GRAVAÇÃO / REPRODUÇÃO
+# -----------------------------------------------------------------------------
+_fixtures_lock = threading.Lock()
+_fixtures = {
+    "modo": MODO_FIXTURES,
+    "arquivo": ARQUIVO_FIXTURES,
+    "latencia": LATENCIA_REPRODUCAO,
+    "gravacoes": None,   # url → registro, carregado sob demanda no modo 'reproduzir'
+}
+
+def configurar_fixtures(modo, arquivo=None, latencia=None):
+    """Troca o modo de gravação/reprodução em tempo de execução (usado pelos benchmarks)"""
+    if modo not in ("", "gravar", "reproduzir"):
+        raise ValueError(f"Modo de fixtures desconhecido: {modo!r}")
+    with _fixtures_lock:
+        _fixtures["modo"] = modo
+        if arquivo is not None:
+            _fixtures["arquivo"] = arquivo
+        if latencia is not None:
+            _fixtures["latencia"] = str(latencia)
+        _fixtures["gravacoes"] = None
+
+def _chave_url(url, params):
+    """URL final da requisição (com a query string de `params`), usada como chave das gravações"""
+    if not params:
+        return url
+    return requests.Request("GET", url, params=params).prepare().url
+
+def _gravar(chave, resp, latencia_ms):
+    try:
+        corpo = {"texto": resp.content.decode("utf-8")}
+    except UnicodeDecodeError:
+        corpo = {"base64": base64.b64encode(resp.content).decode("ascii")}
+    registro = {
+        "url": chave,
+        "status": resp.status_code,
+        "reason": resp.reason,
+        "headers": {k: v for k, v in resp.headers.items() if k.lower() in ("content-type", "etag", "last-modified")},
+        "encoding": resp.encoding,
+        "latencia_ms": round(latencia_ms, 1),
+        "gravado_em": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        **corpo,
+    }
+    with _fixtures_lock:
+        diretorio = os.path.dirname(_fixtures["arquivo"])
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        with open(_fixtures["arquivo"], "a", encoding="utf-8") as f:
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+    _contar("gravadas")
+
+def _gravacoes():
+    with _fixtures_lock:
+        if _fixtures["gravacoes"] is None:
+            gravacoes = {}
+            with open(_fixtures["arquivo"], encoding="utf-8") as f:
+                for linha in f:
+                    if linha.strip():
+                        registro = json.loads(linha)
+                        gravacoes[registro["url"]] = registro  # a gravação mais recente vence
+            _fixtures["gravacoes"] = gravacoes
+            logger.info(f"📼 {len(gravacoes)} respostas gravadas carregadas de {_fixtures['arquivo']}.")
+        return _fixtures["gravacoes"]
+
+def _reproduzir(chave):
+    registro = _gravacoes().get(chave)
+    if registro is None:
+        _contar("sem_gravacao")
+        raise requests.ConnectionError(f"Sem resposta gravada para {chave}")
+
+    latencia = _fixtures["latencia"]
+    espera_ms = registro.get("latencia_ms", 0) if latencia == "gravada" else float(latencia or 0)
+    if espera_ms > 0:
+        time.sleep(espera_ms / 1000)
+
+    resp = requests.Response()
+    resp.status_code = registro["status"]
+    resp.reason = registro.get("reason")
+    resp.headers = CaseInsensitiveDict(registro.get("headers", {}))
+    resp.encoding = registro.get("encoding")
+    resp.url = chave
+    if "base64" in registro:
+        resp._content = base64.b64decode(registro["base64"])
+    else:
+        resp._content = registro.get("texto", "").encode("utf-8")
+    _contar("reproduzidas")
+    return resp
+
+# -----------------------------------------------------------------------------
+# API PÚBLICA
+# -----------------------------------------------------------------------------
+def get(url, timeout=None, **kwargs):
+    """GET com keep-alive, retentativas, gzip e timeout do endpoint; mesma interface de requests.get"""
+    modo = _fixtures["modo"]
+    inicio = time.perf_counter()
+    try:
+        if modo == "reproduzir":
+            resp = _reproduzir(_chave_url(url, kwargs.get("params")))
+        else:
+            resp = _sessao().get(url, timeout=timeout or timeout_para(url), **kwargs)
+    except Exception:
+        _registrar(url, inicio, erro=True)
+        raise
+    latencia_ms = (time.perf_counter() - inicio) * 1000
+    _registrar(url, inicio, erro=resp.status_code >= 400)
+    if modo == "gravar":
+        _gravar(_chave_url(url, kwargs.get("params")), resp, latencia_ms)
+    return resp
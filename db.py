@@ -0,0 +1,217 @@
+# db.py
+import os
+import sqlite3
+import threading
+import time
+
+# -----------------------------------------------------------------------------
+# CONFIGURAÇÕES
+# -----------------------------------------------------------------------------
+DB_PATH = 'users.db'
+
+BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "10000"))
+CACHE_KIB = int(os.getenv("SQLITE_CACHE_KIB", "16384"))
+MMAP_BYTES = int(os.getenv("SQLITE_MMAP_BYTES", str(64 * 1024 * 1024)))
+# Statements preparados mantidos por conexão (a conexão agora vive enquanto a thread viver)
+STATEMENTS_EM_CACHE = int(os.getenv("SQLITE_STATEMENTS_EM_CACHE", "256"))
+# Consultas acima deste tempo contam como lentas nas métricas (em geral, espera por trava)
+CONSULTA_LENTA_MS = float(os.getenv("SQLITE_CONSULTA_LENTA_MS", "50"))
+
+# WAL: leitores não bloqueiam o escritor (e vice-versa) entre os workers do gunicorn;
+# com WAL, synchronous=NORMAL continua seguro contra corrupção
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    f"PRAGMA cache_size=-{CACHE_KIB}",
+    f"PRAGMA mmap_size={MMAP_BYTES}",
+    "PRAGMA temp_store=MEMORY",
+)
+
+# -----------------------------------------------------------------------------
+# MÉTRICAS
+# -----------------------------------------------------------------------------
+_metricas_lock = threading.Lock()
+_metricas = {
+    "conexoes_criadas": 0,
+    "emprestimos": 0,
+    "consultas": 0,
+    "tempo_total_ms": 0.0,
+    "consultas_lentas": 0,
+    "espera_escrita_total_ms": 0.0,
+    "espera_escrita_max_ms": 0.0,
+    "bloqueios": 0,
+}
+
+def _contar(nome, n=1):
+    with _metricas_lock:
+        _metricas[nome] += n
+
+def _registrar(sql, inicio, erro=None):
+    duracao_ms = (time.perf_counter() - inicio) * 1000
+    # BEGIN IMMEDIATE e COMMIT são onde um escritor espera pela trava do outro
+    escrita = sql is None or sql.lstrip()[:15].upper().startswith(("BEGIN IMMEDIATE", "COMMIT"))
+    bloqueio = isinstance(erro, sqlite3.OperationalError) and ("locked" in str(erro) or "busy" in str(erro))
+    with _metricas_lock:
+        _metricas["consultas"] += 1
+        _metricas["tempo_total_ms"] += duracao_ms
+        _metricas["consultas_lentas"] += int(duracao_ms >= CONSULTA_LENTA_MS)
+        _metricas["bloqueios"] += int(bloqueio)
+        if escrita:
+            _metricas["espera_escrita_total_ms"] += duracao_ms
+            _metricas["espera_escrita_max_ms"] = max(_metricas["espera_escrita_max_ms"], duracao_ms)
+
+def metricas():
+    """Retrato das conexões, consultas e contenção de travas do SQLite neste processo"""
+    with _metricas_lock:
+        valores = dict(_metricas)
+    for nome in ("tempo_total_ms", "espera_escrita_total_ms", "espera_escrita_max_ms"):
+        valores[nome] = round(valores[nome], 1)
+    return valores
+
+# -----------------------------------------------------------------------------
+# CONEXÕES
+# -----------------------------------------------------------------------------
+class _CursorMedido(sqlite3.Cursor):
+    def execute(self, sql, parametros=()):
+        inicio = time.perf_counter()
+        try:
+            resultado = super().execute(sql, parametros)
+        except sqlite3.Error as e:
+            _registrar(sql, inicio, e)
+            raise
+        _registrar(sql, inicio)
+        return resultado
+
+    def executemany(self, sql, parametros):
+        inicio = time.perf_counter()
+        try:
+            resultado = super().executemany(sql, parametros)
+        except sqlite3.Error as e:
+            _registrar(sql, inicio, e)
+            raise
+        _registrar(sql, inicio)
+        return resultado
+
+
+class _ConexaoMedida(sqlite3.Connection):
+    """Conexão que mede cada comando (inclusive os executados direto na conexão)"""
+
+    def cursor(self, factory=_CursorMedido):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return self.cursor().executemany(sql, parametros)
+
+    def commit(self):
+        inicio = time.perf_counter()
+        try:
+            super().commit()
+        except sqlite3.Error as e:
+            _registrar(None, inicio, e)
+            raise
+        _registrar(None, inicio)
+
+
+class _Emprestimo:
+    """A conexão da thread, emprestada a um trecho de código.
+
+    `close()` devolve a conexão em vez de fechá-la: uma transação deixada aberta é
+    desfeita quando o último empréstimo da thread é devolvido, como aconteceria
+    ao fechar uma conexão própria. Como gerenciador de contexto (`with db.conectar()
+    as conn:`), a conexão é devolvida na saída do bloco e, se houve exceção, a
+    transação em andamento é desfeita antes.
+    """
+    __slots__ = ("_conn", "_geracao", "_devolvida")
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._geracao = conn.geracao
+        conn.emprestimos += 1
+        self._devolvida = False
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, tb):
+        if tipo is not None and self._conn.in_transaction:
+            self._conn.rollback()
+        self.close()
+        return False
+
+    def __del__(self):
+        # Empréstimo abandonado por uma exceção antes do close(): devolve como o GC fecharia uma conexão própria
+        if hasattr(self, "_devolvida"):
+            self.close()
+
+    def close(self):
+        if self._devolvida:
+            return
+        self._devolvida = True
+        # Depois de liberar(), os empréstimos antigos já foram zerados
+        if self._geracao != self._conn.geracao:
+            return
+        self._conn.emprestimos -= 1
+        if self._conn.emprestimos == 0 and self._conn.in_transaction:
+            self._conn.rollback()
+
+
+_local = threading.local()
+
+def _abrir(caminho):
+    conn = sqlite3.connect(
+        caminho,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        factory=_ConexaoMedida,
+        cached_statements=STATEMENTS_EM_CACHE,
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    conn.emprestimos = 0
+    conn.geracao = 0
+    _contar("conexoes_criadas")
+    return conn
+
+def _conexoes_da_thread():
+    conexoes = getattr(_local, "conexoes", None)
+    # Depois de um fork (workers do gunicorn), as conexões herdadas não podem ser reaproveitadas
+    if conexoes is None or _local.pid != os.getpid():
+        conexoes = _local.conexoes = {}
+        _local.pid = os.getpid()
+    return conexoes
+
+def conectar(caminho=None):
+    """Conexão SQLite da thread atual (uma por arquivo), aberta na primeira vez com WAL e os PRAGMAs.
+
+    Use como gerenciador de contexto (`with db.conectar() as conn:`) ou como uma conexão
+    comum, com `close()` num `finally` — que apenas a devolve.
+    """
+    caminho = caminho or DB_PATH
+    conexoes = _conexoes_da_thread()
+    conn = conexoes.get(caminho)
+    if conn is None:
+        conn = conexoes[caminho] = _abrir(caminho)
+    elif conn.emprestimos == 0 and conn.in_transaction:
+        # Primeiro empréstimo: nada do trecho anterior pode continuar segurando a trava de escrita
+        conn.rollback()
+    _contar("emprestimos")
+    return _Emprestimo(conn)
+
+def liberar():
+    """Devolve todas as conexões da thread: desfaz transações abertas e zera os empréstimos.
+
+    Chamado ao fim de cada requisição, para que um empréstimo esquecido (ou preso numa
+    exceção) não deixe a thread segurando a trava de escrita do banco.
+    """
+    for conn in _conexoes_da_thread().values():
+        if conn.emprestimos or conn.in_transaction:
+            conn.geracao += 1
+            conn.emprestimos = 0
+            if conn.in_transaction:
+                conn.rollback()
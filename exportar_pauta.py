@@ -1,8 +1,17 @@
-from flask import Blueprint, current_app, make_response
+from flask import Blueprint, current_app, jsonify, make_response, request, send_file, url_for
+from flask_login import login_required
 from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import logging
 import os
 import re
-import requests
+import threading
+import time
+import cliente_http
+import db
+from cache_pdf import CacheArquivos
 from datetime import datetime
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import cm
@@ -10,12 +19,24 @@ from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import (
     BaseDocTemplate, PageTemplate, Frame, Paragraph, Spacer,
-    Table, TableStyle, PageBreak
+    Table, TableStyle, PageBreak, NextPageTemplate
 )
+from reportlab.lib.utils import ImageReader
+from datetime import date, timedelta
+from preaquecimento import FUSO
 from reportlab.pdfgen import canvas as pdfcanvas
 from reportlab.pdfbase.pdfmetrics import stringWidth
 
 exportar_bp = Blueprint("exportar", __name__, url_prefix="/exportar")
+logger = logging.getLogger(__name__)
+
+# PDFs prontos, pela chave do conteúdo (versão da pauta + versão das notas + dados do evento)
+pdf_cache = CacheArquivos()
+# Mude ao alterar o layout do PDF, para não servir arquivos gerados pelo layout antigo
+LAYOUT_VERSAO = 2
+
+# Sem depender do app context: o PDF também pode ser gerado fora de uma requisição
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
 
 # ---------------------------------------------------------------------
 # Tradução manual de meses
@@ -39,12 +60,77 @@ def data_ptbr(dt_str):
 def _strip_html(s):
     return re.sub(r"<[^>]+>", "", str(s or "")).strip()
 
+# ---------------------------------------------------------------------
+# Recursos do PDF (montados uma vez por processo)
+# ---------------------------------------------------------------------
+_recursos = None
+_recursos_lock = threading.Lock()
+
+def _carregar_logo(nome):
+    caminho = os.path.join(STATIC_DIR, nome)
+    if not os.path.exists(caminho):
+        return None
+    try:
+        logo = ImageReader(caminho)
+        logo.getRGBData()  # decodifica agora, não na primeira página de cada documento
+        return logo
+    except Exception as e:
+        logger.warning(f"Logo {nome} indisponível para a exportação: {e}")
+        return None
+
+def _obter_recursos():
+    """Estilos, estilo da tabela-resumo e logos decodificados, compartilhados por todas as exportações.
+
+    Estilos e ImageReader não são alterados durante o build, então podem ser usados
+    por vários documentos ao mesmo tempo.
+    """
+    global _recursos
+    if _recursos is None:
+        with _recursos_lock:
+            if _recursos is None:
+                styles = getSampleStyleSheet()
+                w, _ = A4
+                _recursos = {
+                    "title": ParagraphStyle(name="Title", parent=styles["Title"], alignment=1, fontSize=16, leading=18),
+                    "normal": ParagraphStyle(name="Normal", parent=styles["Normal"], fontSize=10.5, leading=14, wordWrap="CJK"),
+                    "bold": ParagraphStyle(name="Bold", parent=styles["Normal"], fontName="Helvetica-Bold", fontSize=11, leading=14),
+                    "heading": ParagraphStyle(name="HeadingItem", parent=styles["Heading1"], fontSize=13, leading=16, spaceBefore=12),
+                    # Equivalente ao estilo implícito de Paragraph(texto) sem estilo
+                    "padrao": ParagraphStyle(name="paragraphImplicitDefaultStyle"),
+                    "tabela_resumo": TableStyle([
+                        ("GRID", (0,0), (-1,-1), 0.3, colors.gray),
+                        ("BACKGROUND", (0,0), (-1,0), colors.HexColor("#E8F3EC")),
+                        ("FONTNAME", (0,0), (-1,0), "Helvetica-Bold")
+                    ]),
+                    "logos": [(logo, x) for logo, x in [
+                        (_carregar_logo("logo_camara.png"), 1.5*cm),
+                        (_carregar_logo("logo_pl.png"), w-3.7*cm),
+                    ] if logo is not None],
+                }
+    return _recursos
+
 # ---------------------------------------------------------------------
 # Cabeçalho e rodapé
 # ---------------------------------------------------------------------
+FORM_LOGOS = "logos_cabecalho"
+
+def _desenhar_logos(canvas, logos):
+    """Logos como um form XObject: a imagem é gravada uma vez no documento e cada página só o referencia"""
+    if not getattr(canvas, "_form_logos_pronto", False):
+        _, h = A4
+        canvas.beginForm(FORM_LOGOS)
+        for logo, x in logos:
+            try:
+                canvas.drawImage(logo, x, h-2.5*cm, width=2.3*cm,
+                                 preserveAspectRatio=True, mask='auto')
+            except Exception:
+                pass
+        canvas.endForm()
+        canvas._form_logos_pronto = True
+    canvas.doForm(FORM_LOGOS)
+
 def _header_footer(canvas, doc, logos, header_text):
     w, h = A4
-    camara_path, pl_path = logos
     canvas.saveState()
 
     # linha superior
@@ -52,13 +138,7 @@ def _header_footer(canvas, doc, logos, header_text):
     canvas.line(1.5*cm, h-1.8*cm, w-1.5*cm, h-1.8*cm)
 
     # logos
-    for path, x in [(camara_path, 1.5*cm), (pl_path, w-3.7*cm)]:
-        if os.path.exists(path):
-            try:
-                canvas.drawImage(path, x, h-2.5*cm, width=2.3*cm,
-                                 preserveAspectRatio=True, mask='auto')
-            except Exception:
-                pass
+    _desenhar_logos(canvas, logos)
 
     # título central
     canvas.setFont("Helvetica-Bold", 10)
@@ -79,8 +159,20 @@ def _header_footer(canvas, doc, logos, header_text):
 class PautaDocTemplate(BaseDocTemplate):
     def __init__(self, *args, **kwargs):
         self.pdf_title = kwargs.pop("pdf_title", None)
+        # progresso(itens, paginas): chamado a cada item detalhado posto na página
+        self.progresso = kwargs.pop("progresso", None)
+        # Página em que cada evento começa, nos documentos de vários eventos (ver _gerar_pdf_periodo)
+        self.paginas_eventos = {}
         super().__init__(*args, **kwargs)
 
+    def afterFlowable(self, flowable):
+        posicao = getattr(flowable, "item_pauta", None)
+        if self.progresso and posicao is not None:
+            self.progresso(posicao, self.page)
+        evento = getattr(flowable, "inicio_evento", None)
+        if evento is not None:
+            self.paginas_eventos.setdefault(evento, self.page)
+
     def build(self, flowables, **kwargs):
         def canvasmaker(*args, **kw):
             c = pdfcanvas.Canvas(*args, **kw)
@@ -92,148 +184,527 @@ class PautaDocTemplate(BaseDocTemplate):
 # ---------------------------------------------------------------------
 # Funções de dados
 # ---------------------------------------------------------------------
+_EVENTO_DESCONHECIDO = {"descricao": "", "dataHoraInicio": "", "local": "Plenário"}
+
 def _get_evento(evento_id):
-    url = f"https://dadosabertos.camara.leg.br/api/v2/eventos/{evento_id}"
-    try:
-        r = requests.get(url, timeout=10)
-        d = r.json().get("dados", {})
-        return {
-            "descricao": d.get("descricao", ""),
-            "dataHoraInicio": d.get("dataHoraInicio", ""),
-            "local": d.get("localCamara", {}).get("nome", "Plenário")
-            if isinstance(d.get("localCamara"), dict)
-            else d.get("localCamara", "Plenário")
-        }
-    except Exception:
-        return {"descricao": "", "dataHoraInicio": "", "local": "Plenário"}
+    """Dados do evento pelo cache de eventos do app; None se a API não respondeu"""
+    from app import fetch_evento_por_id
+    d = fetch_evento_por_id(evento_id)
+    if d.get("dataHoraInicio") == "N/D":
+        return None
+    return {
+        "descricao": d.get("descricao", ""),
+        "dataHoraInicio": d.get("dataHoraInicio", ""),
+        "local": d.get("local", "Plenário"),
+    }
 
 def _get_itens(evento_id):
     """
-    Primeiro tenta buscar do cache 'pauta_cache' do app.
-    Se não existir, tenta via fetch_pauta().
-    Caso ainda vazio, faz fallback para a API oficial.
+    Fallback para a API oficial, quando o app não tem a pauta raspada
+    (o caminho normal é app.estado_pauta: cache compartilhado → cache persistente → scraping).
     """
     try:
-        # 1️⃣ do cache da aplicação
-        pauta_cache = getattr(current_app, "pauta_cache", None)
-        if pauta_cache and evento_id in pauta_cache:
-            return pauta_cache[evento_id]
-
-        # 2️⃣ via função do app
-        from app import fetch_pauta
-        itens = fetch_pauta(evento_id, force_reload=False)
-        if isinstance(itens, dict) and "dados" in itens:
-            return itens["dados"]
-        elif isinstance(itens, list):
-            return itens
-
-        # 3️⃣ fallback: API oficial
-        r = requests.get(
-            f"https://dadosabertos.camara.leg.br/api/v2/eventos/{evento_id}/pauta",
-            timeout=10
-        )
+        r = cliente_http.get(f"https://dadosabertos.camara.leg.br/api/v2/eventos/{evento_id}/pauta")
         return r.json().get("dados", [])
 
     except Exception as e:
         current_app.logger.error(f"Erro ao obter itens: {e}")
         return []
 
+def _chave_pdf(evento_id, evento, assinatura):
+    dados = {"evento_id": evento_id, "evento": evento, "pauta": assinatura, "layout": LAYOUT_VERSAO}
+    return hashlib.sha1(json.dumps(dados, sort_keys=True).encode("utf-8")).hexdigest()[:24]
+
+def invalidar_pdfs(evento_id):
+    """Descarta os PDFs guardados do evento (chamado ao salvar uma nota)"""
+    return pdf_cache.invalidar(evento_id)
+
+def _resposta_bytes(pdf, evento_id):
+    resp = make_response(pdf)
+    resp.headers["Content-Type"] = "application/pdf"
+    resp.headers["Content-Disposition"] = f'inline; filename="Pauta_{evento_id}.pdf"'
+    return resp
+
+def _resposta_pdf(caminho, evento_id, etag, nome_arquivo=None):
+    resp = send_file(caminho, mimetype="application/pdf", etag=False, conditional=False,
+                     download_name=nome_arquivo or f"Pauta_{evento_id}.pdf", as_attachment=False)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
 # ---------------------------------------------------------------------
 # Rota principal
 # ---------------------------------------------------------------------
 @exportar_bp.route("/<int:evento_id>")
+@login_required
 def exportar_pauta(evento_id):
     try:
+        from app import estado_pauta, aplicar_notas
+
         evento = _get_evento(evento_id)
-        itens = _get_itens(evento_id)
+        estado = estado_pauta(evento_id)
+        if not estado["itens"]:
+            # Sem pauta raspada: monta a partir da API oficial, sem guardar em cache
+            pdf = _gerar_pdf(evento_id, evento or _EVENTO_DESCONHECIDO, _get_itens(evento_id))
+            if pdf is None:
+                return "Nenhum item encontrado para esta pauta.", 200
+            return _resposta_bytes(pdf, evento_id)
+
+        chave = _chave_pdf(evento_id, evento, estado["assinatura"])
+        if request.if_none_match.contains(chave):
+            resp = make_response("", 304)
+            resp.set_etag(chave)
+            return resp
+
+        caminho = pdf_cache.get(evento_id, chave)
+        if caminho is None:
+            pdf = _gerar_pdf(evento_id, evento or _EVENTO_DESCONHECIDO, aplicar_notas(estado["itens"], estado["notas"]))
+            if evento is None:
+                # Cabeçalho incompleto (evento indisponível): não fica em cache
+                return _resposta_bytes(pdf, evento_id)
+            caminho = pdf_cache.set(evento_id, chave, pdf)
+        return _resposta_pdf(caminho, evento_id, chave)
+
+    except Exception as e:
+        current_app.logger.error(f"Erro ao exportar pauta {evento_id}: {e}")
+        return f"Erro ao gerar PDF: {e}", 200
 
-        if not itens:
-            return "Nenhum item encontrado para esta pauta.", 200
+# ---------------------------------------------------------------------
+# Geração do PDF
+# ---------------------------------------------------------------------
+def _novo_documento(buffer, pdf_title, progresso=None):
+    return PautaDocTemplate(
+        buffer,
+        pdf_title=pdf_title,
+        progresso=progresso,
+        pagesize=A4,
+        leftMargin=2.2*cm, rightMargin=2.2*cm,
+        topMargin=2.6*cm, bottomMargin=2.0*cm
+    )
 
-        static_path = os.path.join(current_app.root_path, "static")
-        camara_logo = os.path.join(static_path, "logo_camara.png")
-        pl_logo = os.path.join(static_path, "logo_pl.png")
+def _modelo_pagina(doc, id_modelo, header_text, recursos):
+    frame = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height-0.5*cm, id="normal")
+    return PageTemplate(
+        id=id_modelo, frames=[frame],
+        onPage=lambda c, d: _header_footer(c, d, recursos["logos"], header_text)
+    )
 
-        # estilos
-        styles = getSampleStyleSheet()
-        title = ParagraphStyle(name="Title", parent=styles["Title"], alignment=1, fontSize=16, leading=18)
-        normal = ParagraphStyle(name="Normal", parent=styles["Normal"], fontSize=10.5, leading=14, wordWrap="CJK")
-        bold = ParagraphStyle(name="Bold", parent=styles["Normal"], fontName="Helvetica-Bold", fontSize=11, leading=14)
-        heading = ParagraphStyle(name="HeadingItem", parent=styles["Heading1"], fontSize=13, leading=16, spaceBefore=12)
+def _texto_cabecalho(evento):
+    data_txt = data_ptbr(evento.get("dataHoraInicio", ""))
+    return f"Sessão Deliberativa - Plenário — {data_txt}"
 
-        buffer = BytesIO()
-        pdf_title = f"Pauta_{evento_id}"
-        doc = PautaDocTemplate(
-            buffer,
-            pdf_title=pdf_title,
-            pagesize=A4,
-            leftMargin=2.2*cm, rightMargin=2.2*cm,
-            topMargin=2.6*cm, bottomMargin=2.0*cm
-        )
-        frame = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height-0.5*cm, id="normal")
+def _story_pauta(evento, itens, recursos):
+    """Flowables da pauta de um evento: dados da sessão, resumo dos itens e itens detalhados"""
+    title, normal, bold, heading = recursos["title"], recursos["normal"], recursos["bold"], recursos["heading"]
 
-        # Cabeçalho
-        data_txt = data_ptbr(evento.get("dataHoraInicio", ""))
-        header_text = f"Sessão Deliberativa - Plenário — {data_txt}"
+    story = []
+    story.append(Paragraph("Sessão Deliberativa", title))
+    story.append(Paragraph(f"<b>Data/Hora:</b> {evento.get('dataHoraInicio','')}", normal))
+    story.append(Paragraph(f"<b>Descrição:</b> {evento.get('descricao','')}", normal))
+    story.append(Paragraph(f"<b>Local:</b> {evento.get('local','Plenário')}", normal))
+    story.append(Spacer(1, 12))
 
-        doc.addPageTemplates([
-            PageTemplate(
-                id="main", frames=[frame],
-                onPage=lambda c, d: _header_footer(c, d, (camara_logo, pl_logo), header_text)
-            )
+    # Resumo dos Itens
+    story.append(Paragraph("Resumo dos Itens", bold))
+    table_data = [["Item", "Título", "Ementa"]]
+    for it in itens:
+        table_data.append([
+            Paragraph(str(it.get("ordem", "—")), normal),
+            Paragraph(it.get("projeto", "—"), recursos["padrao"]),
+            Paragraph(_strip_html(it.get("ementa", "—")), normal)
         ])
+    tbl = Table(table_data, colWidths=[2*cm, 7*cm, 8*cm])
+    tbl.setStyle(recursos["tabela_resumo"])
+    story.append(tbl)
+    story.append(PageBreak())
 
-        # -----------------------------------------------------------------
-        # Montagem do conteúdo
-        # -----------------------------------------------------------------
-        story = []
-        story.append(Paragraph("Sessão Deliberativa", title))
-        story.append(Paragraph(f"<b>Data/Hora:</b> {evento.get('dataHoraInicio','')}", normal))
-        story.append(Paragraph(f"<b>Descrição:</b> {evento.get('descricao','')}", normal))
-        story.append(Paragraph(f"<b>Local:</b> {evento.get('local','Plenário')}", normal))
-        story.append(Spacer(1, 12))
-
-        # Resumo dos Itens
-        story.append(Paragraph("Resumo dos Itens", bold))
-        table_data = [["Item", "Título", "Ementa"]]
-        for it in itens:
-            table_data.append([
-                Paragraph(str(it.get("ordem", "—")), normal),
-                Paragraph(it.get("projeto", "—")), 
-                Paragraph(_strip_html(it.get("ementa", "—")), normal)
-            ])
-        tbl = Table(table_data, colWidths=[2*cm, 7*cm, 8*cm])
-        tbl.setStyle(TableStyle([
-            ("GRID", (0,0), (-1,-1), 0.3, colors.gray),
-            ("BACKGROUND", (0,0), (-1,0), colors.HexColor("#E8F3EC")),
-            ("FONTNAME", (0,0), (-1,0), "Helvetica-Bold")
-        ]))
-        story.append(tbl)
-        story.append(PageBreak())
-
-        # Itens detalhados
-        for it in itens:
-            story.append(Paragraph(f"Item {it.get('ordem','—')} — {it.get('projeto','')}", heading))
-            story.append(Paragraph(f"<b>Autor:</b> {it.get('autor','N/D')}", normal))
-            story.append(Paragraph(f"<b>Relator:</b> {it.get('relator','N/D')}", normal))
-            story.append(Paragraph(f"<b>Situação:</b> {it.get('situacao','N/D')}", normal))
+    # Itens detalhados
+    for posicao, it in enumerate(itens, 1):
+        titulo = Paragraph(f"Item {it.get('ordem','—')} — {it.get('projeto','')}", heading)
+        titulo.item_pauta = posicao
+        story.append(titulo)
+        story.append(Paragraph(f"<b>Autor:</b> {it.get('autor','N/D')}", normal))
+        story.append(Paragraph(f"<b>Relator:</b> {it.get('relator','N/D')}", normal))
+        story.append(Paragraph(f"<b>Situação:</b> {it.get('situacao','N/D')}", normal))
+        story.append(Spacer(1, 6))
+
+        if it.get("resumo_materia"):
+            story.append(Paragraph("Nota Técnica", bold))
+            story.append(Paragraph(_strip_html(it["resumo_materia"]), normal))
             story.append(Spacer(1, 6))
+    return story
 
-            if it.get("resumo_materia"):
-                story.append(Paragraph("Nota Técnica", bold))
-                story.append(Paragraph(_strip_html(it["resumo_materia"]), normal))
-                story.append(Spacer(1, 6))
+def _gerar_pdf(evento_id, evento, itens, progresso=None):
+    """Monta o PDF da pauta; retorna os bytes, ou None se não houver itens.
 
-        # Geração do PDF
-        doc.build(story)
-        pdf = buffer.getvalue()
-        buffer.close()
+    `progresso(itens, paginas)` acompanha a montagem (ver PautaDocTemplate).
+    """
+    if not itens:
+        return None
+
+    recursos = _obter_recursos()
+    buffer = BytesIO()
+    doc = _novo_documento(buffer, f"Pauta_{evento_id}", progresso)
+    doc.addPageTemplates([_modelo_pagina(doc, "main", _texto_cabecalho(evento), recursos)])
 
-        resp = make_response(pdf)
-        resp.headers["Content-Type"] = "application/pdf"
-        resp.headers["Content-Disposition"] = f'inline; filename="Pauta_{evento_id}.pdf"'
+    # Geração do PDF
+    doc.build(_story_pauta(evento, itens, recursos))
+    pdf = buffer.getvalue()
+    buffer.close()
+    return pdf
+
+# ---------------------------------------------------------------------
+# Exportação em segundo plano
+# ---------------------------------------------------------------------
+# O doc.build de uma pauta longa leva segundos: com só dois workers do gunicorn, a geração
+# vai para um pool local e a requisição só acompanha o job (estado gravado no SQLite,
+# visível a todos os workers). Pedidos para a mesma versão do PDF compartilham o job.
+EXPORTACAO_WORKERS = int(os.getenv("EXPORTACAO_WORKERS", "1"))
+# Um job sem sinal de vida por mais que isso é considerado abandonado (worker reiniciado)
+EXPORTACAO_JOB_TTL = int(os.getenv("EXPORTACAO_JOB_TTL_SEGUNDOS", "600"))
+EXPORTACAO_JOB_RETENCAO = 24 * 3600
+
+_exportacao_executor = ThreadPoolExecutor(max_workers=EXPORTACAO_WORKERS, thread_name_prefix="exportacao")
+_tabela_jobs_criada = False
+
+def _conectar_jobs():
+    global _tabela_jobs_criada
+    conn = db.conectar()
+    if not _tabela_jobs_criada:
+        conn.execute('''CREATE TABLE IF NOT EXISTS exportacoes (
+            id TEXT PRIMARY KEY,
+            evento_id INTEGER NOT NULL,
+            estado TEXT NOT NULL,
+            itens_total INTEGER NOT NULL DEFAULT 0,
+            itens_prontos INTEGER NOT NULL DEFAULT 0,
+            paginas INTEGER NOT NULL DEFAULT 0,
+            erro TEXT,
+            criado_em REAL NOT NULL,
+            atualizado_em REAL NOT NULL
+        )''')
+        conn.commit()
+        _tabela_jobs_criada = True
+    return conn
+
+def _ler_job(job_id):
+    conn = _conectar_jobs()
+    try:
+        row = conn.execute(
+            '''SELECT id, evento_id, estado, itens_total, itens_prontos, paginas, erro, criado_em, atualizado_em
+               FROM exportacoes WHERE id = ?''', (job_id,)
+        ).fetchone()
+    finally:
+        conn.close()
+    if not row:
+        return None
+    campos = ("id", "evento_id", "estado", "itens_total", "itens_prontos", "paginas", "erro", "criado_em", "atualizado_em")
+    return dict(zip(campos, row))
+
+def _atualizar_job(job_id, **campos):
+    campos["atualizado_em"] = time.time()
+    conn = _conectar_jobs()
+    try:
+        conn.execute(
+            f"UPDATE exportacoes SET {', '.join(f'{nome} = ?' for nome in campos)} WHERE id = ?",
+            (*campos.values(), job_id)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+def _reservar_job(job_id, evento_id, itens_total):
+    """Cria o job, a menos que um igual já esteja na fila/em andamento; retorna se cabe a quem chamou gerá-lo"""
+    agora = time.time()
+    conn = _conectar_jobs()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT estado, atualizado_em FROM exportacoes WHERE id = ?", (job_id,)).fetchone()
+        if row and row[0] in ("fila", "gerando") and agora - row[1] < EXPORTACAO_JOB_TTL:
+            conn.commit()
+            return False
+        conn.execute(
+            '''INSERT OR REPLACE INTO exportacoes
+               (id, evento_id, estado, itens_total, itens_prontos, paginas, erro, criado_em, atualizado_em)
+               VALUES (?, ?, 'fila', ?, 0, 0, NULL, ?, ?)''',
+            (job_id, evento_id, itens_total, agora, agora)
+        )
+        conn.execute("DELETE FROM exportacoes WHERE atualizado_em < ?", (agora - EXPORTACAO_JOB_RETENCAO,))
+        conn.commit()
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def _executar_job(job_id, evento_id, chave, evento, itens):
+    def progresso(posicao, paginas):
+        _atualizar_job(job_id, itens_prontos=posicao, paginas=paginas)
+
+    try:
+        _atualizar_job(job_id, estado="gerando")
+        inicio = time.time()
+        pdf = _gerar_pdf(evento_id, evento, itens, progresso=progresso)
+        pdf_cache.set(evento_id, chave, pdf)
+        _atualizar_job(job_id, estado="pronto", itens_prontos=len(itens))
+        logger.info(f"📄 PDF da pauta {evento_id} gerado em segundo plano em {time.time() - inicio:.1f}s.")
+    except Exception as e:
+        logger.error(f"Erro ao gerar PDF da pauta {evento_id} em segundo plano: {e}")
+        _atualizar_job(job_id, estado="erro", erro=str(e))
+
+def _separar_job_id(job_id):
+    match = re.fullmatch(r"(\d+)-([0-9a-f]{24})", job_id)
+    return (int(match.group(1)), match.group(2)) if match else (None, None)
+
+def _job_em_cache(job_id):
+    """Job implícito de um PDF que já está em cache (ex.: gerado pela rota síncrona); None se não houver"""
+    evento_id, chave = _separar_job_id(job_id)
+    caminho = pdf_cache.get(evento_id, chave) if evento_id is not None else None
+    if caminho is None:
+        return None
+    gerado_em = os.path.getmtime(caminho)
+    return {"id": job_id, "evento_id": evento_id, "estado": "pronto", "itens_total": None, "itens_prontos": None,
+            "paginas": None, "erro": None, "criado_em": gerado_em, "atualizado_em": gerado_em}
+
+def _resposta_job(job):
+    evento_id, chave = _separar_job_id(job["id"])
+    if job["estado"] == "pronto" and pdf_cache.get(evento_id, chave) is None:
+        # O PDF saiu do cache (nota salva ou despejo LRU): é preciso pedir uma nova exportação
+        job = {**job, "estado": "descartado"}
+    resposta = {**job, "status_url": url_for("exportar.status_job", job_id=job["id"])}
+    if job["estado"] == "pronto":
+        resposta["download_url"] = url_for("exportar.baixar_job", job_id=job["id"])
+    return resposta
+
+@exportar_bp.route("/<int:evento_id>/job", methods=["POST"])
+@login_required
+def criar_job(evento_id):
+    """Enfileira a geração do PDF; devolve o job (202) ou, se o PDF já estiver pronto, 200"""
+    try:
+        from app import estado_pauta, aplicar_notas
+
+        evento = _get_evento(evento_id)
+        estado = estado_pauta(evento_id)
+        if not estado["itens"]:
+            return jsonify({"erro": "Nenhum item encontrado para esta pauta."}), 404
+
+        chave = _chave_pdf(evento_id, evento, estado["assinatura"])
+        job_id = f"{evento_id}-{chave}"
+        if pdf_cache.get(evento_id, chave) is None and _reservar_job(job_id, evento_id, len(estado["itens"])):
+            itens = aplicar_notas(estado["itens"], estado["notas"])
+            _exportacao_executor.submit(_executar_job, job_id, evento_id, chave, evento or _EVENTO_DESCONHECIDO, itens)
+            logger.info(f"🕒 Exportação da pauta {evento_id} enfileirada ({job_id}).")
+
+        job = _resposta_job(_ler_job(job_id) or _job_em_cache(job_id))
+        return jsonify(job), 200 if job["estado"] == "pronto" else 202
+
+    except Exception as e:
+        current_app.logger.error(f"Erro ao enfileirar exportação da pauta {evento_id}: {e}")
+        return jsonify({"erro": f"Erro ao enfileirar exportação: {e}"}), 500
+
+@exportar_bp.route("/job/<job_id>")
+@login_required
+def status_job(job_id):
+    job = _ler_job(job_id) or _job_em_cache(job_id)
+    if job is None:
+        return jsonify({"erro": "Job de exportação não encontrado."}), 404
+    return jsonify(_resposta_job(job))
+
+@exportar_bp.route("/job/<job_id>/pdf")
+@login_required
+def baixar_job(job_id):
+    evento_id, chave = _separar_job_id(job_id)
+    if evento_id is None:
+        return jsonify({"erro": "Job de exportação não encontrado."}), 404
+    if request.if_none_match.contains(chave):
+        resp = make_response("", 304)
+        resp.set_etag(chave)
         return resp
+    caminho = pdf_cache.get(evento_id, chave)
+    if caminho is None:
+        job = _ler_job(job_id)
+        if job and job["estado"] in ("fila", "gerando"):
+            return jsonify({"erro": "PDF ainda em geração.", **_resposta_job(job)}), 409
+        return jsonify({"erro": "PDF não disponível; solicite uma nova exportação."}), 410
+    return _resposta_pdf(caminho, evento_id, chave)
+
+# ---------------------------------------------------------------------
+# Pacote de um período (ex.: a semana inteira)
+# ---------------------------------------------------------------------
+# Com pypdf, cada evento entra no pacote como o mesmo PDF da exportação individual (e do
+# mesmo cache): reexportar a semana só gera de novo as pautas que mudaram. Sem pypdf, o
+# pacote é montado num único documento do ReportLab.
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:
+    PdfReader = PdfWriter = None
+
+EXPORTACAO_PERIODO_MAX_DIAS = int(os.getenv("EXPORTACAO_PERIODO_MAX_DIAS", "31"))
+EXPORTACAO_PACOTE_WORKERS = int(os.getenv("EXPORTACAO_PACOTE_WORKERS", "4"))
+
+_pacote_executor = ThreadPoolExecutor(max_workers=EXPORTACAO_PACOTE_WORKERS, thread_name_prefix="pacote")
+
+def _datas_periodo(inicio, fim):
+    """Datas ISO de `inicio` a `fim` (padrão: a semana, de segunda a domingo, que contém `inicio`)"""
+    # Semana corrente no horário de Brasília, como o resto do app
+    dia = date.fromisoformat(inicio) if inicio else datetime.now(FUSO).date()
+    if fim:
+        ultimo = date.fromisoformat(fim)
+    else:
+        if not inicio:
+            dia -= timedelta(days=dia.weekday())
+        ultimo = dia + timedelta(days=6)
+    if ultimo < dia:
+        raise ValueError("fim anterior ao início")
+    if (ultimo - dia).days + 1 > EXPORTACAO_PERIODO_MAX_DIAS:
+        raise ValueError(f"período maior que {EXPORTACAO_PERIODO_MAX_DIAS} dias")
+    return [(dia + timedelta(days=n)).isoformat() for n in range((ultimo - dia).days + 1)]
+
+def _estado_evento(evento_id):
+    from app import estado_pauta
+    evento = _get_evento(evento_id)
+    estado = estado_pauta(evento_id)
+    return {
+        "evento_id": evento_id,
+        "evento": evento or _EVENTO_DESCONHECIDO,
+        "estado": estado,
+        "chave": _chave_pdf(evento_id, evento, estado["assinatura"]),
+    }
+
+def _fragmento(parte):
+    """Caminho do PDF do evento no cache, gerando-o se preciso"""
+    from app import aplicar_notas
+    caminho = pdf_cache.get(parte["evento_id"], parte["chave"])
+    if caminho is None:
+        estado = parte["estado"]
+        pdf = _gerar_pdf(parte["evento_id"], parte["evento"], aplicar_notas(estado["itens"], estado["notas"]))
+        caminho = pdf_cache.set(parte["evento_id"], parte["chave"], pdf)
+    return caminho
+
+def _rotulo_evento(evento):
+    data = evento.get("dataHoraInicio", "")
+    try:
+        data = datetime.fromisoformat(data).strftime("%d/%m/%Y %H:%M")
+    except ValueError:
+        pass
+    return f"{data} — {evento.get('descricao', '')}"
+
+def _story_indice(titulo, partes, paginas, recursos):
+    normal, bold = recursos["normal"], recursos["bold"]
+    story = [Paragraph(titulo, recursos["title"]), Spacer(1, 12), Paragraph("Sumário", bold), Spacer(1, 6)]
+    linhas = [["Sessão", "Itens", "Página"]]
+    for parte in partes:
+        linhas.append([
+            Paragraph(_rotulo_evento(parte["evento"]), normal),
+            Paragraph(str(len(parte["estado"]["itens"])), normal),
+            Paragraph(str(paginas.get(parte["evento_id"], "—")), normal),
+        ])
+    tbl = Table(linhas, colWidths=[13*cm, 2*cm, 2*cm])
+    tbl.setStyle(recursos["tabela_resumo"])
+    story.append(tbl)
+    return story
+
+def _gerar_indice(titulo, partes, paginas):
+    recursos = _obter_recursos()
+    buffer = BytesIO()
+    doc = _novo_documento(buffer, titulo)
+    doc.addPageTemplates([_modelo_pagina(doc, "indice", titulo, recursos)])
+    doc.build(_story_indice(titulo, partes, paginas, recursos))
+    return buffer.getvalue()
+
+def _juntar_fragmentos(titulo, partes, caminhos):
+    """Sumário + PDFs dos eventos, com um marcador (outline) por sessão"""
+    leitores = [PdfReader(caminho) for caminho in caminhos]
+    # O sumário é montado uma vez para saber quantas páginas ocupa e outra com as páginas certas
+    paginas_indice = len(PdfReader(BytesIO(_gerar_indice(titulo, partes, {}))).pages)
+    paginas, proxima = {}, paginas_indice + 1
+    for parte, leitor in zip(partes, leitores):
+        paginas[parte["evento_id"]] = proxima
+        proxima += len(leitor.pages)
+
+    writer = PdfWriter()
+    writer.append(BytesIO(_gerar_indice(titulo, partes, paginas)), outline_item="Sumário")
+    for parte, leitor in zip(partes, leitores):
+        writer.append(leitor, outline_item=_rotulo_evento(parte["evento"]), import_outline=False)
+    if hasattr(writer, "compress_identical_objects"):
+        # Fontes e logos repetidos em cada fragmento passam a ser gravados uma vez só
+        writer.compress_identical_objects()
+    writer.add_metadata({"/Title": titulo})
+    buffer = BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+def _gerar_pdf_periodo(titulo, partes):
+    """Pacote num único documento do ReportLab (sem pypdf): um build para paginar, outro com o sumário completo"""
+    from app import aplicar_notas
+    recursos = _obter_recursos()
+    itens = [aplicar_notas(parte["estado"]["itens"], parte["estado"]["notas"]) for parte in partes]
+
+    def montar(paginas):
+        buffer = BytesIO()
+        doc = _novo_documento(buffer, titulo)
+        doc.addPageTemplates(
+            [_modelo_pagina(doc, "indice", titulo, recursos)]
+            + [_modelo_pagina(doc, f"evento_{n}", _texto_cabecalho(parte["evento"]), recursos)
+               for n, parte in enumerate(partes)]
+        )
+        story = _story_indice(titulo, partes, paginas, recursos)
+        for n, (parte, itens_evento) in enumerate(zip(partes, itens)):
+            story_evento = _story_pauta(parte["evento"], itens_evento, recursos)
+            story_evento[0].inicio_evento = parte["evento_id"]
+            story += [NextPageTemplate(f"evento_{n}"), PageBreak()] + story_evento
+        doc.build(story)
+        return buffer.getvalue(), doc.paginas_eventos
+
+    _, paginas = montar({})
+    pdf, _ = montar(paginas)
+    return pdf
+
+def _data_curta(data_iso):
+    return date.fromisoformat(data_iso).strftime("%d/%m/%Y")
+
+@exportar_bp.route("/periodo")
+@login_required
+def exportar_periodo():
+    """PDF único com as Sessões Deliberativas de um período (`inicio` e `fim`, AAAA-MM-DD; padrão: a semana atual)"""
+    from app import fetch_eventos_por_data
+
+    try:
+        datas = _datas_periodo(request.args.get("inicio"), request.args.get("fim"))
+    except ValueError as e:
+        return jsonify({"erro": f"Período inválido: {e}"}), 400
+
+    try:
+        # Uma sessão que atravessa a meia-noite aparece nas listagens dos dois dias
+        eventos = list({e["id"]: e for lista in _pacote_executor.map(fetch_eventos_por_data, datas) for e in lista}.values())
+        eventos.sort(key=lambda e: e.get("dataHoraInicio", ""))
+        partes = [p for p in _pacote_executor.map(_estado_evento, [int(e["id"]) for e in eventos]) if p["estado"]["itens"]]
+        if not partes:
+            return f"Nenhuma pauta encontrada entre {datas[0]} e {datas[-1]}.", 200
+
+        prefixo = f"periodo_{datas[0]}_{datas[-1]}"
+        assinatura = [(p["evento_id"], p["chave"]) for p in partes]
+        chave = hashlib.sha1(json.dumps({"partes": assinatura, "layout": LAYOUT_VERSAO, "pypdf": PdfWriter is not None})
+                             .encode("utf-8")).hexdigest()[:24]
+        if request.if_none_match.contains(chave):
+            resp = make_response("", 304)
+            resp.set_etag(chave)
+            return resp
+
+        caminho = pdf_cache.get(prefixo, chave)
+        if caminho is None:
+            inicio = time.time()
+            titulo = f"Pautas do Plenário — {_data_curta(datas[0])} a {_data_curta(datas[-1])}"
+            if PdfWriter is not None:
+                caminhos = list(_pacote_executor.map(_fragmento, partes))
+                pdf = _juntar_fragmentos(titulo, partes, caminhos)
+            else:
+                pdf = _gerar_pdf_periodo(titulo, partes)
+            caminho = pdf_cache.set(prefixo, chave, pdf)
+            logger.info(f"📚 Pacote {prefixo} com {len(partes)} sessões gerado em {time.time() - inicio:.1f}s.")
+
+        return _resposta_pdf(caminho, prefixo, chave, f"Pautas_{datas[0]}_{datas[-1]}.pdf")
 
     except Exception as e:
-        current_app.logger.error(f"Erro ao exportar pauta {evento_id}: {e}")
+        current_app.logger.error(f"Erro ao exportar o período {datas[0]} a {datas[-1]}: {e}")
         return f"Erro ao gerar PDF: {e}", 200
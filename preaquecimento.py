@@ -0,0 +1,130 @@
+# preaquecimento.py
+import argparse
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from cache_compartilhado import TravaSQLite
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------------------------------------------------------
+# CONFIGURAÇÕES
+# -----------------------------------------------------------------------------
+FUSO = ZoneInfo("America/Sao_Paulo")
+
+INTERVALO_CICLO = int(os.getenv("PREAQUECER_CICLO_SEGUNDOS", "30"))
+INTERVALO_EM_ANDAMENTO = int(os.getenv("PREAQUECER_EM_ANDAMENTO_SEGUNDOS", "60"))
+INTERVALO_PADRAO = int(os.getenv("PREAQUECER_PADRAO_SEGUNDOS", "900"))
+INTERVALO_LISTAGEM = int(os.getenv("PREAQUECER_LISTAGEM_SEGUNDOS", "600"))
+
+# Só um processo (worker ou CLI) pré-aquece por vez; os demais ficam de reserva
+TRAVA_LIDER = "preaquecimento"
+TRAVA_LIDER_TTL = INTERVALO_CICLO * 3
+
+_trava = TravaSQLite()
+_estado_lock = threading.Lock()
+_estado = {
+    "lider": False,
+    "ciclos": 0,
+    "pautas_atualizadas": 0,
+    "ultimo_ciclo": None,
+    "eventos": [],
+}
+
+def estado():
+    """Retrato do pré-aquecedor deste processo, para /api/metricas"""
+    with _estado_lock:
+        return dict(_estado)
+
+# -----------------------------------------------------------------------------
+# CICLO
+# -----------------------------------------------------------------------------
+def intervalo_para(evento):
+    """Intervalo de atualização adaptativo: rápido durante a sessão, lento fora dela"""
+    if (evento.get("situacao") or "").strip().lower() == "em andamento":
+        return INTERVALO_EM_ANDAMENTO
+    return INTERVALO_PADRAO
+
+def listar_sessoes():
+    """Sessões Deliberativas de hoje e de amanhã (horário de Brasília)"""
+    from app import fetch_eventos_por_data
+
+    hoje = datetime.now(FUSO).date()
+    eventos = {}
+    for dia in (hoje, hoje + timedelta(days=1)):
+        for evento in fetch_eventos_por_data(dia.strftime("%Y-%m-%d")):
+            eventos.setdefault(evento["id"], evento)
+    return list(eventos.values())
+
+def preaquecer(eventos):
+    """Monta as pautas cujo snapshot já passou do intervalo do evento; retorna quantas foram atualizadas"""
+    from app import _ler_snapshot, _idade_snapshot, _construir_pauta_unica
+
+    atualizadas = 0
+    for evento in eventos:
+        evento_id = int(evento["id"])
+        snapshot = _ler_snapshot(evento_id)
+        idade = _idade_snapshot(snapshot[1]) if snapshot else float("inf")
+        if idade < intervalo_para(evento):
+            continue
+        logger.info(f"🔥 Pré-aquecendo pauta {evento_id} ({evento.get('situacao', 'N/D')}).")
+        try:
+            _construir_pauta_unica(evento_id)
+            atualizadas += 1
+        except Exception as e:
+            logger.warning(f"⚠️ Falha ao pré-aquecer pauta {evento_id}: {e}")
+    return atualizadas
+
+def executar(uma_vez=False):
+    """Laço do pré-aquecedor; com uma_vez=True executa um único ciclo (útil em cron)"""
+    dono = None
+    eventos = []
+    listado_em = 0.0
+    while True:
+        try:
+            if dono and not _trava.renovar(TRAVA_LIDER, dono, TRAVA_LIDER_TTL):
+                dono = None
+            if not dono:
+                dono = _trava.adquirir(TRAVA_LIDER, TRAVA_LIDER_TTL)
+
+            if dono:
+                if time.time() - listado_em >= INTERVALO_LISTAGEM:
+                    eventos = listar_sessoes()
+                    listado_em = time.time()
+                    logger.info(f"🔥 Pré-aquecedor acompanhando {len(eventos)} sessões deliberativas.")
+                atualizadas = preaquecer(eventos)
+                with _estado_lock:
+                    _estado["ciclos"] += 1
+                    _estado["pautas_atualizadas"] += atualizadas
+                    _estado["ultimo_ciclo"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    _estado["eventos"] = [e["id"] for e in eventos]
+            with _estado_lock:
+                _estado["lider"] = bool(dono)
+        except Exception as e:
+            logger.warning(f"⚠️ Erro no ciclo de pré-aquecimento: {e}")
+
+        if uma_vez:
+            if dono:
+                _trava.liberar(TRAVA_LIDER, dono)
+            return
+        time.sleep(INTERVALO_CICLO)
+
+def iniciar_em_segundo_plano():
+    """Inicia o pré-aquecedor numa thread daemon do processo atual"""
+    thread = threading.Thread(target=executar, name="preaquecimento", daemon=True)
+    thread.start()
+    logger.info("🔥 Pré-aquecedor de pautas iniciado em segundo plano.")
+    return thread
+
+# -----------------------------------------------------------------------------
+# EXECUÇÃO DIRETA
+# -----------------------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pré-aquece as pautas das Sessões Deliberativas de hoje e amanhã.")
+    parser.add_argument("--uma-vez", action="store_true", help="executa um único ciclo e sai")
+    args = parser.parse_args()
+    executar(uma_vez=args.uma_vez)
@@ -1,8 +1,14 @@
-import requests
-from bs4 import BeautifulSoup
+import cliente_http
+from cache_proposicoes import obter_proposicao, separar_codigo, registrar_codigos, buscar_id_por_codigo
+from bs4 import BeautifulSoup, SoupStrainer
 import re
+import hashlib
+import json
 import logging
+import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 # -----------------------------------------------------------------------------
 # LOGGING
@@ -10,12 +16,34 @@ import sys
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
+# Máximo de consultas simultâneas à API durante o enriquecimento dos itens da pauta
+MAX_WORKERS_ENRIQUECIMENTO = int(os.getenv("SCRAPER_MAX_WORKERS", "8"))
+
+# Validade do enriquecimento (detalhes/autores) de um item que não mudou na página do evento
+ENRIQUECIMENTO_TTL = int(os.getenv("SCRAPER_ENRIQUECIMENTO_TTL_SEGUNDOS", "21600"))
+
+# Parser do HTML do evento: 'lxml' (em C, se instalado) ou 'html.parser' (Python puro)
+try:
+    import lxml  # noqa: F401
+    _PARSER_PADRAO = "lxml"
+except ImportError:
+    _PARSER_PADRAO = "html.parser"
+PARSER_HTML = os.getenv("SCRAPER_PARSER_HTML", _PARSER_PADRAO)
+
+# Parse parcial: só materializa o <main> da página (cabeçalho, menus, rodapé e scripts são descartados)
+PARSE_PARCIAL = os.getenv("SCRAPER_PARSE_PARCIAL", "true").lower() == "true"
+_SOMENTE_CONTEUDO = SoupStrainer("main")
+
+_RE_NUMERO_FINAL = re.compile(r'\s*\d+$')
+_RE_AUTOR = re.compile("Autor", re.I)
+_RE_RELATOR = re.compile("Relator", re.I)
+_RE_ID_PROPOSICAO = re.compile(r"idProposicao=(\d+)")
+
 # -----------------------------------------------------------------------------
 # FUNÇÃO AUXILIAR PARA DETALHES DE PROPOSIÇÃO
 # -----------------------------------------------------------------------------
 def obter_detalhes_proposicao(id_prop):
-    """Obtém detalhes complementares de uma proposição pela API da Câmara"""
-    base = f"https://dadosabertos.camara.leg.br/api/v2/proposicoes/{id_prop}"
+    """Obtém detalhes complementares de uma proposição pela API da Câmara (via cache de proposições)"""
     detalhes = {
         "autores": "",
         "relator": "",
@@ -25,18 +53,14 @@ def obter_detalhes_proposicao(id_prop):
         "tem_mais_autores": False
     }
     try:
-        r = requests.get(base, timeout=8)
-        if r.ok:
-            j = r.json().get("dados", {})
-            detalhes["situacao"] = j.get("statusProposicao", {}).get("descricaoSituacao", "")
-            detalhes["ementa"] = j.get("ementa", "")
-            detalhes["urlInteiroTeor"] = j.get("urlInteiroTeor", "")
+        prop = obter_proposicao(id_prop)
+        detalhes["situacao"] = prop["situacao"] or ""
+        detalhes["ementa"] = prop["ementa"] or ""
+        detalhes["urlInteiroTeor"] = prop["url_inteiro_teor"] or ""
 
         # Autores
-        r_autores = requests.get(base + "/autores", timeout=8)
-        if r_autores.ok:
-            autores_dados = r_autores.json().get("dados", [])
-            autores = [f"{a['nome']}" for a in autores_dados if "nome" in a]
+        if prop["autores"] is not None:
+            autores = [nome for nome in prop["autores"] if nome]
             # Limitar a 3 autores, com "e outros" se houver mais
             if len(autores) > 3:
                 detalhes["autores"] = ", ".join(autores[:3]) + " e outros"
@@ -54,19 +78,15 @@ def obter_detalhes_proposicao(id_prop):
 # FUNÇÃO AUXILIAR PARA BUSCAR ID DA PROPOSIÇÃO
 # -----------------------------------------------------------------------------
 def buscar_id_proposicao_por_codigo(codigo):
-    """Busca o idProposicao pela API usando siglaTipo, numero e ano extraídos do código"""
+    """Busca o idProposicao pelo índice local (ou pela API) usando siglaTipo, numero e ano extraídos do código"""
     try:
-        match = re.match(r"(\w+)\s+(\d+)/(\d+)", codigo.strip())
-        if not match:
+        partes = separar_codigo(codigo)
+        if not partes:
             logger.warning(f"⚠️ Formato de código inválido: {codigo}")
             return None
-        sigla_tipo, numero, ano = match.groups()
-        url = f"https://dadosabertos.camara.leg.br/api/v2/proposicoes?siglaTipo={sigla_tipo}&numero={numero}&ano={ano}"
-        r = requests.get(url, timeout=8)
-        if r.ok:
-            dados = r.json().get("dados", [])
-            if dados:
-                return str(dados[0].get("id"))
+        id_prop = buscar_id_por_codigo(*partes)
+        if id_prop:
+            return id_prop
         logger.warning(f"⚠️ Nenhuma proposição encontrada para {codigo}")
         return None
     except Exception as e:
@@ -74,37 +94,40 @@ def buscar_id_proposicao_por_codigo(codigo):
         return None
 
 # -----------------------------------------------------------------------------
-# FUNÇÃO PRINCIPAL DE SCRAPING
+# EXTRAÇÃO DOS ITENS DO HTML DO EVENTO
 # -----------------------------------------------------------------------------
-def obter_itens_pauta(id_evento):
-    """Obtém a lista de proposições da pauta de um evento legislativo pelo site da Câmara"""
-    url_evento = f"https://www.camara.leg.br/evento-legislativo/{id_evento}"
-    logger.info(f"🌐 Acessando {url_evento} ...")
-
-    try:
-        resp = requests.get(url_evento, timeout=10)
-        resp.raise_for_status()
-    except Exception as e:
-        logger.error(f"❌ Falha ao baixar HTML: {e}")
-        return []
-
-    html = resp.text
-    logger.info(f"📄 HTML baixado ({len(html)} caracteres)")
-
-    soup = BeautifulSoup(html, "html.parser")
+def _montar_soup(html, parser, parcial):
+    if parcial:
+        soup = BeautifulSoup(html, parser, parse_only=_SOMENTE_CONTEUDO)
+        if soup.find("h2", class_="info-reveal__title"):
+            return soup
+        logger.info("Parse parcial não encontrou as seções da pauta; analisando a página inteira.")
+    return BeautifulSoup(html, parser)
+
+def _extrair_itens_html(html, parser=None, parcial=None):
+    """Extrai do HTML do evento os itens brutos da pauta, na ordem da página e com a seção de cada um.
+
+    `parser` e `parcial` sobrescrevem SCRAPER_PARSER_HTML e SCRAPER_PARSE_PARCIAL; o resultado
+    é o mesmo com qualquer combinação.
+    """
+    soup = _montar_soup(html, parser or PARSER_HTML, PARSE_PARCIAL if parcial is None else parcial)
 
     # Buscar todas as seções h2 com classe info-reveal__title
     secoes_h2 = soup.find_all("h2", class_="info-reveal__title")
     logger.info(f"🔍 Seções h2 detectadas: {[h2.get_text(strip=True) for h2 in secoes_h2]}")
 
-    itens = []
-    vistos = set()  # Para evitar duplicatas
+    # Divs de collapse indexadas pelo id, em vez de uma busca na árvore inteira por seção
+    divs_por_id = {}
+    for div in soup.find_all("div", id=True):
+        divs_por_id.setdefault(div["id"], div)
+
+    brutos = []
 
     # Mapeamento de seções específicas baseadas no texto do h2 e no target do botão de toggle
     for h2 in secoes_h2:
         texto_raw = h2.get_text(strip=True)
         # Limpar números do título
-        texto_limpo = re.sub(r'\s*\d+$', '', texto_raw).strip().lower()
+        texto_limpo = _RE_NUMERO_FINAL.sub('', texto_raw).strip().lower()
         logger.info(f"Processando seção: '{texto_raw}' -> '{texto_limpo}'")
 
         # Normalizar o nome da seção
@@ -129,7 +152,7 @@ def obter_itens_pauta(id_evento):
                 continue
 
             # Encontrar o div de collapse com esse ID e a ul dentro dele
-            div_collapse = soup.find("div", id=target_id.replace("#", ""))
+            div_collapse = divs_por_id.get(target_id.replace("#", ""))
             if not div_collapse:
                 logger.warning(f"⚠️ Div de collapse '{target_id}' não encontrado para a seção '{secao_nome}'. Pulando...")
                 continue
@@ -171,60 +194,228 @@ def obter_itens_pauta(id_evento):
                 relator = ""
 
                 if info:
-                    autor_tag = info.find(string=re.compile("Autor", re.I))
+                    autor_tag = info.find(string=_RE_AUTOR)
                     if autor_tag and autor_tag.parent:
                         autores = autor_tag.parent.find_next_sibling(string=True) or ""
                         autores = autores.strip(" :") if autores else ""
-                    relator_tag = info.find(string=re.compile("Relator", re.I))
+                    relator_tag = info.find(string=_RE_RELATOR)
                     if relator_tag and relator_tag.parent:
                         relator = relator_tag.parent.find_next_sibling(string=True) or ""
                         relator = relator.strip(" :") if relator else ""
 
                 # ID da proposição
-                match = re.search(r"idProposicao=(\d+)", url)
-                id_prop = match.group(1) if match else None
-
-                # Fallback: buscar idProposicao via API se não encontrado na URL
-                if not id_prop:
-                    logger.info(f"🔍 Buscando idProposicao para {codigo} via API...")
-                    id_prop = buscar_id_proposicao_por_codigo(codigo)
+                match = _RE_ID_PROPOSICAO.search(url)
 
-                if not id_prop:
-                    logger.warning(f"⚠️ idProposicao não encontrado para {codigo}. Pulando item.")
-                    continue
-
-                # Evitar duplicatas
-                if id_prop in vistos:
-                    logger.warning(f"⚠️ Proposição {codigo} (id {id_prop}) já processada. Pulando...")
-                    continue
-                vistos.add(id_prop)
-
-                # Obter detalhes complementares via API
-                info_extra = obter_detalhes_proposicao(id_prop)
-                if info_extra["autores"]:
-                    autores = info_extra["autores"]
-                if info_extra["relator"]:
-                    relator = info_extra["relator"]
-                situacao = info_extra["situacao"]
-                ementa_final = info_extra["ementa"] or ementa_html
-                url_inteiro_teor = info_extra["urlInteiroTeor"]
-
-                itens.append({
-                    "id_principal": id_prop,
+                brutos.append({
+                    "id_prop": match.group(1) if match else None,
                     "codigo": codigo,
-                    "ementa": ementa_final,
-                    "autores": autores,
-                    "relator": relator or "Não atribuído",
-                    "situacao": situacao or "N/D",
-                    "urlInteiroTeor": url_inteiro_teor,
                     "url": url,
-                    "secao": secao_nome,
-                    "tem_mais_autores": info_extra["tem_mais_autores"]
+                    "ementa_html": ementa_html,
+                    "autores": autores,
+                    "relator": relator,
+                    "secao": secao_nome
                 })
 
             except Exception as e:
                 logger.warning(f"⚠️ Erro ao processar item da pauta (seção {secao_nome}): {e}")
 
+    return brutos
+
+# -----------------------------------------------------------------------------
+# ENRIQUECIMENTO CONCORRENTE DOS ITENS
+# -----------------------------------------------------------------------------
+def _resolver_id(bruto):
+    """Fallback: buscar idProposicao via API se não encontrado na URL"""
+    logger.info(f"🔍 Buscando idProposicao para {bruto['codigo']} via API...")
+    return buscar_id_proposicao_por_codigo(bruto["codigo"])
+
+def assinatura_item(bruto):
+    """Resumo do conteúdo do item na página (seção e campos da linha), usado para detectar mudanças"""
+    campos = [bruto["codigo"], bruto["url"], bruto["ementa_html"], bruto["autores"], bruto["relator"], bruto["secao"]]
+    return hashlib.sha1(json.dumps(campos, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def _enriquecer_item(bruto):
+    """Obtém detalhes complementares via API e monta o item final da pauta"""
+    id_prop = bruto["id_prop"]
+    info_extra = obter_detalhes_proposicao(id_prop)
+    autores = info_extra["autores"] or bruto["autores"]
+    relator = info_extra["relator"] or bruto["relator"]
+
+    return {
+        "id_principal": id_prop,
+        "codigo": bruto["codigo"],
+        "ementa": info_extra["ementa"] or bruto["ementa_html"],
+        "autores": autores,
+        "relator": relator or "Não atribuído",
+        "situacao": info_extra["situacao"] or "N/D",
+        "urlInteiroTeor": info_extra["urlInteiroTeor"],
+        "url": bruto["url"],
+        "secao": bruto["secao"],
+        "tem_mais_autores": info_extra["tem_mais_autores"],
+        "assinatura": assinatura_item(bruto),
+        "enriquecido_em": time.time()
+    }
+
+def _reaproveitar_item(bruto, anterior):
+    """Monta o item a partir da linha atual e do enriquecimento de uma raspagem anterior.
+
+    Do snapshot saem só os campos estáticos; a situação muda durante a sessão e é relida
+    do cache de proposições, que só volta à API depois de SITUACAO_TTL.
+    """
+    situacao = ""
+    try:
+        situacao = obter_proposicao(bruto["id_prop"], autores=False)["situacao"] or ""
+    except Exception as e:
+        logger.warning(f"⚠️ Falha ao atualizar a situação da proposição {bruto['id_prop']}: {e}")
+
+    return {
+        "id_principal": bruto["id_prop"],
+        "codigo": bruto["codigo"],
+        "ementa": anterior.get("ementa") or bruto["ementa_html"],
+        "autores": anterior.get("autores") or bruto["autores"],
+        "relator": bruto["relator"] or "Não atribuído",
+        "situacao": situacao or anterior.get("situacao") or "N/D",
+        "urlInteiroTeor": anterior.get("urlInteiroTeor", ""),
+        "url": bruto["url"],
+        "secao": bruto["secao"],
+        "tem_mais_autores": anterior.get("tem_mais_autores", False),
+        "assinatura": anterior["assinatura"],
+        "enriquecido_em": anterior["enriquecido_em"]
+    }
+
+def _executar_em_paralelo(executor, funcao, brutos, ao_concluir=None):
+    """Executa `funcao` para cada item no pool; retorna os resultados na ordem de entrada (None em caso de falha).
+
+    `ao_concluir(bruto, resultado)`, se informado, é chamado na thread do pool assim que cada item termina.
+    """
+    futuros = [executor.submit(funcao, bruto) for bruto in brutos]
+    if ao_concluir:
+        def notificar(bruto, futuro):
+            if futuro.exception() is None:
+                ao_concluir(bruto, futuro.result())
+
+        for bruto, futuro in zip(brutos, futuros):
+            futuro.add_done_callback(lambda f, bruto=bruto: notificar(bruto, f))
+    resultados = []
+    for bruto, futuro in zip(brutos, futuros):
+        try:
+            resultados.append(futuro.result())
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao processar item da pauta {bruto['codigo']} (seção {bruto['secao']}): {e}")
+            resultados.append(None)
+    return resultados
+
+# -----------------------------------------------------------------------------
+# FUNÇÃO PRINCIPAL DE SCRAPING
+# -----------------------------------------------------------------------------
+def obter_itens_pauta(id_evento, max_workers=None, anteriores=None, progresso=None):
+    """Obtém a lista de proposições da pauta de um evento legislativo pelo site da Câmara.
+
+    As consultas à API (idProposicao, detalhes e autores) rodam em paralelo, limitadas a
+    `max_workers` threads (padrão: SCRAPER_MAX_WORKERS); a ordem e a seção dos itens
+    são as mesmas da página.
+
+    Atualização incremental: `anteriores` mapeia id_principal → item de uma raspagem
+    anterior (com `codigo`, `assinatura` e `enriquecido_em`). Itens cuja linha não mudou
+    reaproveitam esse enriquecimento enquanto ele tiver menos de ENRIQUECIMENTO_TTL.
+
+    Progresso: `progresso(posicao, total, item)` é chamado para cada item assim que ele fica
+    pronto (reaproveitado ou enriquecido), possivelmente fora de ordem e em outra thread.
+    """
+    url_evento = f"https://www.camara.leg.br/evento-legislativo/{id_evento}"
+    logger.info(f"🌐 Acessando {url_evento} ...")
+
+    try:
+        resp = cliente_http.get(url_evento)
+        resp.raise_for_status()
+    except Exception as e:
+        logger.error(f"❌ Falha ao baixar HTML: {e}")
+        return []
+
+    html = resp.text
+    logger.info(f"📄 HTML baixado ({len(html)} caracteres)")
+
+    brutos = _extrair_itens_html(html)
+    if not brutos:
+        logger.info("📊 Total de 0 proposições únicas coletadas.")
+        return []
+
+    # Os links da página já trazem o id: alimenta o índice código → idProposicao
+    try:
+        registrar_codigos(
+            (*partes, b["id_prop"]) for b in brutos
+            if b["id_prop"] and (partes := separar_codigo(b["codigo"]))
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ Falha ao atualizar índice de códigos: {e}")
+
+    anteriores = anteriores or {}
+    ids_por_codigo = {a.get("codigo"): id_prop for id_prop, a in anteriores.items() if a.get("codigo")}
+    for bruto in brutos:
+        if not bruto["id_prop"] and bruto["codigo"] in ids_por_codigo:
+            bruto["id_prop"] = ids_por_codigo[bruto["codigo"]]
+
+    max_workers = max(1, max_workers or MAX_WORKERS_ENRIQUECIMENTO)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="enriquecimento") as executor:
+        # 1️⃣ Resolver em paralelo os ids ausentes na URL
+        sem_id = [b for b in brutos if not b["id_prop"]]
+        for bruto, id_prop in zip(sem_id, _executar_em_paralelo(executor, _resolver_id, sem_id)):
+            bruto["id_prop"] = id_prop
+
+        # 2️⃣ Evitar duplicatas, mantendo a primeira ocorrência na ordem da página
+        unicos = []
+        vistos = set()
+        for bruto in brutos:
+            id_prop = bruto["id_prop"]
+            if not id_prop:
+                logger.warning(f"⚠️ idProposicao não encontrado para {bruto['codigo']}. Pulando item.")
+                continue
+            if id_prop in vistos:
+                logger.warning(f"⚠️ Proposição {bruto['codigo']} (id {id_prop}) já processada. Pulando...")
+                continue
+            vistos.add(id_prop)
+            unicos.append(bruto)
+
+        # 3️⃣ Itens sem mudança reaproveitam o enriquecimento anterior ainda válido
+        agora = time.time()
+        a_reaproveitar = [
+            bruto for bruto in unicos
+            if (anterior := anteriores.get(bruto["id_prop"]))
+            and anterior.get("assinatura") == assinatura_item(bruto)
+            and agora - (anterior.get("enriquecido_em") or 0) < ENRIQUECIMENTO_TTL
+        ]
+
+        ao_concluir = None
+        if progresso:
+            posicoes = {bruto["id_prop"]: posicao for posicao, bruto in enumerate(unicos)}
+
+            def ao_concluir(bruto, item):
+                try:
+                    progresso(posicoes[bruto["id_prop"]], len(unicos), item)
+                except Exception as e:
+                    logger.warning(f"⚠️ Erro no callback de progresso: {e}")
+
+        # A situação dos reaproveitados também passa pelo pool: vencido o SITUACAO_TTL, cada um consulta a API
+        reaproveitados = {
+            bruto["id_prop"]: item
+            for bruto, item in zip(a_reaproveitar, _executar_em_paralelo(
+                executor, lambda bruto: _reaproveitar_item(bruto, anteriores[bruto["id_prop"]]),
+                a_reaproveitar, ao_concluir))
+            if item
+        }
+
+        # 4️⃣ Detalhes e autores dos itens novos ou alterados em paralelo
+        a_enriquecer = [b for b in unicos if b["id_prop"] not in reaproveitados]
+        logger.info(f"⚡ Enriquecendo {len(a_enriquecer)} proposições com até {max_workers} consultas simultâneas "
+                    f"({len(reaproveitados)} reaproveitadas)...")
+        enriquecidos = {
+            bruto["id_prop"]: item
+            for bruto, item in zip(
+                a_enriquecer, _executar_em_paralelo(executor, _enriquecer_item, a_enriquecer, ao_concluir)
+            )
+        }
+        itens = [i for i in (reaproveitados.get(b["id_prop"]) or enriquecidos.get(b["id_prop"]) for b in unicos) if i]
+
     logger.info(f"📊 Total de {len(itens)} proposições únicas coletadas.")
     return itens
 
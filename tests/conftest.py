@@ -0,0 +1,22 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+@pytest.fixture(scope="session")
+def app_modulo():
+    # users.db e os caches em disco são relativos ao diretório de trabalho
+    anterior = os.getcwd()
+    os.chdir(tempfile.mkdtemp())
+    os.environ.setdefault("OPENAI_API_KEY", "teste")
+    os.environ["PAUTA_PREAQUECER"] = "false"
+    import app
+    app.init_db()
+    app.init_pauta_cache_db()
+    yield app
+    os.chdir(anterior)
@@ -0,0 +1,32 @@
+# tests/test_api_pauta.py
+import pytest
+
+ITENS = [
+    {'ordem': '1', 'id_principal': '101', 'projeto': 'PL 1/2025', 'situacao': 'Pronta para Pauta', 'versao': 1},
+    {'ordem': '2', 'id_principal': '102', 'projeto': 'PL 2/2025', 'situacao': 'Pronta para Pauta', 'versao': 1},
+]
+
+@pytest.fixture
+def cliente(app_modulo, monkeypatch):
+    monkeypatch.setattr(app_modulo, "_carregar_pauta", lambda evento_id, *a, **k: ([dict(i) for i in ITENS], False))
+    cliente = app_modulo.app.test_client()
+    cliente.post('/login', data={'username': 'admin', 'password': '123'})
+    return cliente
+
+def _evento(situacao):
+    return {'id': '79930', 'descricao': 'Sessão Deliberativa', 'dataHoraInicio': '2025-10-21T13:55',
+            'local': 'Plenário', 'situacao': situacao}
+
+def test_etag_muda_quando_so_a_situacao_do_evento_muda(app_modulo, cliente, monkeypatch):
+    monkeypatch.setattr(app_modulo, "fetch_evento_por_id", lambda evento_id: _evento('Convocada'))
+    r = cliente.get('/api/pauta/79930')
+    assert r.status_code == 200
+    etag = r.headers['ETag']
+    assert cliente.get('/api/pauta/79930', headers={'If-None-Match': etag}).status_code == 304
+
+    monkeypatch.setattr(app_modulo, "fetch_evento_por_id", lambda evento_id: _evento('Em Andamento'))
+    r = cliente.get('/api/pauta/79930', headers={'If-None-Match': etag})
+    assert r.status_code == 200
+    assert r.headers['ETag'] != etag
+    assert r.get_json()['evento']['situacao'] == 'Em Andamento'
+    assert r.get_json()['versao'] == '1.0'
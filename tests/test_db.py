@@ -0,0 +1,87 @@
+# tests/test_db.py
+import sqlite3
+import threading
+
+import pytest
+
+import db
+
+@pytest.fixture
+def caminho(tmp_path):
+    caminho = str(tmp_path / "teste.db")
+    with db.conectar(caminho) as conn:
+        conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, valor TEXT)")
+        conn.commit()
+    yield caminho
+    db.liberar()
+
+def _linhas(caminho):
+    return sqlite3.connect(caminho).execute("SELECT COUNT(*) FROM t").fetchone()[0]
+
+def _outro_escritor_consegue(caminho):
+    """Escrita por uma conexão independente (como outro worker), sem esperar pela trava"""
+    outro = sqlite3.connect(caminho, timeout=0.2)
+    try:
+        outro.execute("INSERT INTO t (valor) VALUES ('outro')")
+        outro.commit()
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        outro.close()
+
+def test_excecao_no_bloco_desfaz_a_transacao_e_devolve_a_conexao(caminho):
+    with pytest.raises(sqlite3.IntegrityError):
+        with db.conectar(caminho) as conn:
+            conn.execute("INSERT INTO t (id, valor) VALUES (1, 'a')")
+            conn.execute("INSERT INTO t (id, valor) VALUES (1, 'duplicado')")
+
+    conn = db.conectar(caminho)
+    assert not conn.in_transaction
+    assert conn._conn.emprestimos == 1  # só o empréstimo acima
+    conn.close()
+    assert _linhas(caminho) == 0
+    assert _outro_escritor_consegue(caminho)
+
+def test_liberar_desfaz_emprestimo_esquecido(caminho):
+    esquecido = db.conectar(caminho)
+    esquecido.execute("BEGIN IMMEDIATE")
+    esquecido.execute("INSERT INTO t (valor) VALUES ('a')")
+    assert not _outro_escritor_consegue(caminho)
+
+    db.liberar()
+
+    assert esquecido._conn.emprestimos == 0
+    assert not esquecido.in_transaction
+    assert _outro_escritor_consegue(caminho)
+    # Devolver depois de liberar() não deixa a contagem negativa
+    esquecido.close()
+    assert esquecido._conn.emprestimos == 0
+    assert _linhas(caminho) == 1
+
+def test_emprestimo_interno_nao_desfaz_a_transacao_externa(caminho):
+    with db.conectar(caminho) as externo:
+        externo.execute("INSERT INTO t (valor) VALUES ('a')")
+        with db.conectar(caminho) as interno:
+            assert interno._conn is externo._conn
+        assert externo.in_transaction
+        externo.commit()
+    assert _linhas(caminho) == 1
+
+def test_ultimo_emprestimo_desfaz_o_que_nao_foi_confirmado(caminho):
+    with db.conectar(caminho) as conn:
+        conn.execute("INSERT INTO t (valor) VALUES ('sem commit')")
+    assert _linhas(caminho) == 0
+    assert _outro_escritor_consegue(caminho)
+
+def test_cada_thread_tem_sua_conexao(caminho):
+    conexoes = []
+    def pegar():
+        with db.conectar(caminho) as conn:
+            conexoes.append(conn._conn)
+        db.liberar()
+    t = threading.Thread(target=pegar)
+    t.start()
+    t.join()
+    with db.conectar(caminho) as conn:
+        assert conn._conn is not conexoes[0]
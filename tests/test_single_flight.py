@@ -0,0 +1,90 @@
+# tests/test_single_flight.py
+import json
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+import db
+
+ITENS = [{'ordem': '1', 'id_principal': '101', 'projeto': 'PL 1/2025', 'versao': 1}]
+CHAMADORES = 6
+
+class MontagemFalsa:
+    """Substitui _construir_pauta: conta as chamadas, demora um pouco e grava o snapshot (ou falha)"""
+
+    def __init__(self, falhar=False):
+        self.falhar = falhar
+        self.chamadas = 0
+        self.simultaneas = 0
+        self.max_simultaneas = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, evento_id, progresso=None):
+        with self._lock:
+            self.chamadas += 1
+            self.simultaneas += 1
+            self.max_simultaneas = max(self.max_simultaneas, self.simultaneas)
+        try:
+            time.sleep(0.3)
+            if self.falhar:
+                raise RuntimeError("raspagem falhou")
+            with db.conectar() as conn:
+                conn.execute('''INSERT OR REPLACE INTO pauta_cache_db (evento_id, json_pauta, last_updated, versao)
+                                VALUES (?, ?, ?, 1)''',
+                             (evento_id, json.dumps(ITENS), datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+                conn.commit()
+            return [dict(i) for i in ITENS], False
+        finally:
+            with self._lock:
+                self.simultaneas -= 1
+
+def _chamar_em_paralelo(app_modulo, evento_id):
+    resultados, erros = [], []
+    barreira = threading.Barrier(CHAMADORES)
+
+    def chamar():
+        barreira.wait()
+        try:
+            resultados.append(app_modulo._construir_pauta_unica(evento_id))
+        except Exception as e:
+            erros.append(e)
+
+    threads = [threading.Thread(target=chamar) for _ in range(CHAMADORES)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=30)
+    return resultados, erros
+
+@pytest.fixture
+def montagem(app_modulo, monkeypatch):
+    monkeypatch.setattr(app_modulo, "PAUTA_ESPERA_INTERVALO", 0.02)
+    def instalar(**kwargs):
+        falsa = MontagemFalsa(**kwargs)
+        monkeypatch.setattr(app_modulo, "_construir_pauta", falsa)
+        return falsa
+    return instalar
+
+def test_chamadas_concorrentes_fazem_uma_montagem_e_todas_recebem_o_resultado(app_modulo, montagem):
+    falsa = montagem()
+    resultados, erros = _chamar_em_paralelo(app_modulo, 910001)
+
+    assert erros == []
+    assert falsa.chamadas == 1
+    assert len(resultados) == CHAMADORES
+    for itens, from_cache in resultados:
+        assert [i['id_principal'] for i in itens] == ['101']
+        assert from_cache is False
+
+def test_falha_da_montagem_chega_a_todos_sem_montagens_simultaneas(app_modulo, montagem):
+    falsa = montagem(falhar=True)
+    resultados, erros = _chamar_em_paralelo(app_modulo, 910002)
+
+    # Sem snapshot, quem esperava tenta montar depois, um de cada vez; todos veem a exceção
+    assert resultados == []
+    assert len(erros) == CHAMADORES
+    assert all(isinstance(e, RuntimeError) for e in erros)
+    assert falsa.max_simultaneas == 1
+    assert not app_modulo.trava_pautas.ocupada("pauta:910002")
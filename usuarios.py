@@ -1,9 +1,17 @@
 # usuarios.py
+import os
 import sqlite3
+import tempfile
+import threading
+import time
+import uuid
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_user, logout_user, login_required, current_user, UserMixin
 from flask_bcrypt import Bcrypt
 
+import db
+from cache_compartilhado import CacheMemoria
+
 usuarios_bp = Blueprint('usuarios', __name__, template_folder='templates')
 bcrypt = Bcrypt()
 
@@ -18,24 +26,73 @@ class Usuario(UserMixin):
         self.role = role
 
 def get_db():
-    return sqlite3.connect('users.db')
+    return db.conectar()
+
+# ----------------------------------------------------------
+# Cache de usuários (load_user roda em toda requisição autenticada)
+# ----------------------------------------------------------
+USUARIOS_CACHE_TTL = int(os.getenv("USUARIOS_CACHE_TTL_SEGUNDOS", "30"))
+# Arquivo-marca reescrito a cada alteração de usuário com um valor único: quando o conteúdo
+# muda, os outros workers do gunicorn descartam o cache local sem precisar consultar o banco
+# (o conteúdo, e não o mtime, para não depender da resolução do relógio do sistema de arquivos)
+MARCA_USUARIOS_ALTERADOS = os.getenv("USUARIOS_MARCA_ALTERACAO", "users.db.usuarios-alterados")
+
+usuarios_cache = CacheMemoria("usuarios")
+_marca_vista = None
+_marca_lock = threading.Lock()
+
+def _ler_marca():
+    try:
+        with open(MARCA_USUARIOS_ALTERADOS, encoding="ascii") as f:
+            return f.read()
+    except OSError:
+        return None
+
+def _sincronizar_cache_usuarios():
+    """Descarta o cache se outro worker alterou usuários; retorna a marca lida"""
+    global _marca_vista
+    marca = _ler_marca()
+    if marca != _marca_vista:
+        with _marca_lock:
+            if marca != _marca_vista:
+                usuarios_cache.clear()
+                _marca_vista = marca
+    return marca
+
+def invalidar_usuario(user_id):
+    """Descarta o usuário do cache deste worker e avisa os demais trocando a marca (chamar depois do commit)"""
+    usuarios_cache.invalidate(str(user_id))
+    diretorio = os.path.dirname(os.path.abspath(MARCA_USUARIOS_ALTERADOS))
+    try:
+        fd, temporario = tempfile.mkstemp(dir=diretorio, prefix=".usuarios-alterados-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="ascii") as f:
+                f.write(f"{time.time_ns()}-{os.getpid()}-{uuid.uuid4().hex}")
+            os.replace(temporario, MARCA_USUARIOS_ALTERADOS)
+        except BaseException:
+            os.remove(temporario)
+            raise
+    except OSError:
+        # Sem a marca, os outros workers só veem a alteração quando o TTL vencer
+        pass
 
 def buscar_usuario_por_id(user_id):
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("SELECT id, username, password, role FROM users WHERE id = ?", (user_id,))
-    u = c.fetchone()
-    conn.close()
-    if u:
-        return Usuario(*u)
-    return None
+    marca = _sincronizar_cache_usuarios()
+    chave = str(user_id)
+    u = usuarios_cache.get(chave)
+    if u is None:
+        with get_db() as conn:
+            u = conn.execute("SELECT id, username, password, role FROM users WHERE id = ?", (user_id,)).fetchone()
+        if not u:
+            return None
+        # Se a marca mudou durante a consulta, a linha lida pode ser anterior à alteração: não guarda
+        if _ler_marca() == marca:
+            usuarios_cache.set(chave, u, USUARIOS_CACHE_TTL)
+    return Usuario(*u)
 
 def buscar_usuario_por_nome(username):
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("SELECT id, username, password, role FROM users WHERE username = ?", (username,))
-    u = c.fetchone()
-    conn.close()
+    with get_db() as conn:
+        u = conn.execute("SELECT id, username, password, role FROM users WHERE username = ?", (username,)).fetchone()
     if u:
         return Usuario(*u)
     return None
@@ -77,11 +134,9 @@ def admin_usuarios():
         flash('Acesso restrito a administradores.', 'danger')
         return redirect(url_for('selecionar_data'))
 
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("SELECT id, username, role FROM users ORDER BY id DESC")
-    usuarios = [{'id': r[0], 'username': r[1], 'role': r[2]} for r in c.fetchall()]
-    conn.close()
+    with get_db() as conn:
+        c = conn.execute("SELECT id, username, role FROM users ORDER BY id DESC")
+        usuarios = [{'id': r[0], 'username': r[1], 'role': r[2]} for r in c.fetchall()]
     return render_template('admin_usuarios.html', usuarios=usuarios)
 
 @usuarios_bp.route('/admin/usuarios/criar', methods=['POST'])
@@ -96,16 +151,14 @@ def admin_criar_usuario():
     role = request.form['role']
     senha_hash = bcrypt.generate_password_hash(senha).decode('utf-8')
 
-    conn = get_db()
-    c = conn.cursor()
-    try:
-        c.execute("INSERT INTO users (username, password, role) VALUES (?, ?, ?)", (username, senha_hash, role))
-        conn.commit()
-        flash('Usuário criado com sucesso.', 'success')
-    except sqlite3.IntegrityError:
-        flash('Usuário já existe.', 'danger')
-    finally:
-        conn.close()
+    with get_db() as conn:
+        try:
+            conn.execute("INSERT INTO users (username, password, role) VALUES (?, ?, ?)", (username, senha_hash, role))
+            conn.commit()
+            flash('Usuário criado com sucesso.', 'success')
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            flash('Usuário já existe.', 'danger')
 
     return redirect(url_for('usuarios.admin_usuarios'))
 
@@ -120,11 +173,10 @@ def admin_excluir_usuario(id):
         flash('Você não pode excluir a própria conta.', 'warning')
         return redirect(url_for('usuarios.admin_usuarios'))
 
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("DELETE FROM users WHERE id=?", (id,))
-    conn.commit()
-    conn.close()
+    with get_db() as conn:
+        conn.execute("DELETE FROM users WHERE id=?", (id,))
+        conn.commit()
+    invalidar_usuario(id)
     flash('Usuário excluído com sucesso.', 'success')
     return redirect(url_for('usuarios.admin_usuarios'))
 
@@ -140,17 +192,19 @@ def admin_editar_usuario():
     role = request.form['role']
     senha = request.form['password']
 
-    conn = get_db()
-    c = conn.cursor()
-
-    if senha.strip():
-        senha_hash = bcrypt.generate_password_hash(senha).decode('utf-8')
-        c.execute("UPDATE users SET username=?, password=?, role=? WHERE id=?", (username, senha_hash, role, user_id))
-    else:
-        c.execute("UPDATE users SET username=?, role=? WHERE id=?", (username, role, user_id))
-
-    conn.commit()
-    conn.close()
+    with get_db() as conn:
+        try:
+            if senha.strip():
+                senha_hash = bcrypt.generate_password_hash(senha).decode('utf-8')
+                conn.execute("UPDATE users SET username=?, password=?, role=? WHERE id=?", (username, senha_hash, role, user_id))
+            else:
+                conn.execute("UPDATE users SET username=?, role=? WHERE id=?", (username, role, user_id))
+            conn.commit()
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            flash('Já existe um usuário com esse nome.', 'danger')
+            return redirect(url_for('usuarios.admin_usuarios'))
+    invalidar_usuario(user_id)
     flash('Usuário atualizado com sucesso.', 'success')
     return redirect(url_for('usuarios.admin_usuarios'))
 